@@ -3,16 +3,20 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from config import Config
+from .routing import RoutingSession
+from .metrics import TimedQueuePool
 import os
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession},
+                engine_options={'poolclass': TimedQueuePool})
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 migrate = Migrate()
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__, static_folder='static', template_folder='templates')
     app.config.from_object(Config)
+    app.config.update(config or {})
 
     db.init_app(app)
     login_manager.init_app(app)
@@ -25,6 +29,8 @@ def create_app():
     from .routes_invoices import invoices_bp
     from .routes_payments import payments_bp
     from .routes_portal import portal_bp
+    from .routes_admin import admin_bp
+    from .assets import assets_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
@@ -32,6 +38,44 @@ def create_app():
     app.register_blueprint(invoices_bp)
     app.register_blueprint(payments_bp)
     app.register_blueprint(portal_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(assets_bp)
+
+    # CLI commands
+    from .archive import archive_cli
+    from .jobs import jobs_cli
+    from .notifications import notify_cli
+    from .assets import assets_cli
+    from .ledger import ledger_cli
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(notify_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(ledger_cli)
+
+    # Request latency, pool and business metrics at /metrics
+    from . import metrics
+    metrics.init_app(app, db)
+
+    # Owner-triggered sampling profiler for single requests
+    from . import profiling
+    profiling.init_app(app)
+
+    # Read-only views on the replica engine, writes on the primary
+    from . import routing
+    routing.init_app(app, db)
+
+    # Background job workers
+    from . import jobs
+    jobs.init_app(app)
+
+    # Template fragment + bytecode caches
+    from . import fragments
+    fragments.init_app(app)
+
+    # Fingerprinted static assets (asset_url in templates)
+    from . import assets
+    assets.init_app(app)
 
     # Ensure instance folder exists
     os.makedirs(os.path.join(app.root_path, '..', 'instance'), exist_ok=True)
@@ -0,0 +1,203 @@
+"""Archival of closed invoices and their payments into cold tables.
+
+Paid invoices whose due date (and every payment) falls before a cutoff are
+copied into ``archived_invoice`` / ``archived_payment`` and removed from the
+hot tables in id-ordered chunks, so the list/dashboard queries only ever scan
+live data. Use the ``include_archived`` helpers when a view must span both.
+
+Archived rows keep their ids, so ``invoice`` and ``payment`` are AUTOINCREMENT
+tables on SQLite: a plain rowid table hands out max(rowid) + 1 again once the
+newest rows are gone. The same holds for ``event``, whose pollers only read
+ids above the last one they saw. Run ``flask archive upgrade-ids`` once (with
+the app stopped) to convert databases created before that.
+"""
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, literal, or_, select, text
+from sqlalchemy.schema import CreateTable
+
+from . import db
+from .models import ArchivedInvoice, ArchivedPayment, Event, Invoice, Payment
+
+archive_cli = AppGroup('archive', help='Move closed invoices into the archive tables.')
+
+INVOICE_COLUMNS = [c.name for c in Invoice.__table__.columns]
+PAYMENT_COLUMNS = [c.name for c in Payment.__table__.columns]
+
+
+def default_cutoff():
+    """Cutoff date derived from ARCHIVE_AFTER_DAYS."""
+    return date.today() - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+
+
+def _eligible_ids(cutoff, after_id, limit):
+    """Ids of the next chunk of closed invoices that can be archived."""
+    last_payment = (select(func.max(Payment.date))
+                    .where(Payment.invoice_id == Invoice.id)
+                    .scalar_subquery())
+    stmt = (select(Invoice.id)
+            .where(Invoice.status == 'paid',
+                   Invoice.due_date < cutoff,
+                   Invoice.id > after_id,
+                   or_(last_payment.is_(None), last_payment < cutoff))
+            .order_by(Invoice.id)
+            .limit(limit))
+    return list(db.session.execute(stmt).scalars())
+
+
+def _move_chunk(ids):
+    """Copy one chunk of invoices + payments to the archive and delete the originals."""
+    now = datetime.utcnow()
+    inv_table, pay_table = Invoice.__table__, Payment.__table__
+
+    db.session.execute(insert(ArchivedInvoice.__table__).from_select(
+        INVOICE_COLUMNS + ['archived_at'],
+        select(*[inv_table.c[n] for n in INVOICE_COLUMNS], literal(now))
+        .where(inv_table.c.id.in_(ids))))
+    moved_payments = db.session.execute(insert(ArchivedPayment.__table__).from_select(
+        PAYMENT_COLUMNS + ['archived_at'],
+        select(*[pay_table.c[n] for n in PAYMENT_COLUMNS], literal(now))
+        .where(pay_table.c.invoice_id.in_(ids)))).rowcount
+
+    db.session.execute(delete(pay_table).where(pay_table.c.invoice_id.in_(ids)))
+    db.session.execute(delete(inv_table).where(inv_table.c.id.in_(ids)))
+    db.session.commit()
+    return moved_payments
+
+
+def archive_closed_invoices(cutoff=None, batch_size=None):
+    """Archive paid invoices due before ``cutoff`` along with their payments.
+
+    Each chunk of ``batch_size`` invoices is moved in its own short transaction.
+    Returns a tuple ``(invoices_moved, payments_moved)``.
+    """
+    cutoff = cutoff or default_cutoff()
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+
+    invoices_moved = payments_moved = 0
+    after_id = 0
+    while True:
+        ids = _eligible_ids(cutoff, after_id, batch_size)
+        if not ids:
+            break
+        payments_moved += _move_chunk(ids)
+        invoices_moved += len(ids)
+        after_id = ids[-1]
+    return invoices_moved, payments_moved
+
+
+# --- Schema upgrade ---
+
+def _rebuild(conn, table):
+    """Recreate ``table`` from its current model definition, keeping every row."""
+    quote = conn.dialect.identifier_preparer.quote
+    tmp = f'{table.name}_rebuild'
+    columns = ', '.join(quote(c.name) for c in table.columns)
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+    conn.exec_driver_sql(f'DROP TABLE IF EXISTS {tmp}')
+    conn.exec_driver_sql(ddl.replace(f'CREATE TABLE {quote(table.name)} ', f'CREATE TABLE {tmp} ', 1))
+    conn.exec_driver_sql(f'INSERT INTO {tmp} ({columns}) SELECT {columns} FROM {quote(table.name)}')
+    conn.exec_driver_sql(f'DROP TABLE {quote(table.name)}')
+    conn.exec_driver_sql(f'ALTER TABLE {tmp} RENAME TO {quote(table.name)}')
+    for index in table.indexes:
+        index.create(conn)
+
+
+def upgrade_id_sequences(engine):
+    """Make ``invoice``/``payment``/``event`` AUTOINCREMENT on SQLite databases created without it.
+
+    The id sequence is started after the highest id in the hot or archive table,
+    so ids already archived are never issued again. Idempotent; returns the
+    names of the tables it rebuilt.
+    """
+    upgraded = []
+    if engine.dialect.name != 'sqlite':
+        return upgraded
+    with engine.begin() as conn:
+        for table, archived in ((Invoice.__table__, ArchivedInvoice.__table__),
+                                (Payment.__table__, ArchivedPayment.__table__),
+                                (Event.__table__, None)):
+            sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                               {'name': table.name}).scalar()
+            if sql is None or 'AUTOINCREMENT' in sql.upper():
+                continue
+            _rebuild(conn, table)
+            top = conn.execute(select(func.max(table.c.id))).scalar() or 0
+            if archived is not None:
+                top = max(top, conn.execute(select(func.max(archived.c.id))).scalar() or 0)
+            conn.execute(text('DELETE FROM sqlite_sequence WHERE name = :name'), {'name': table.name})
+            conn.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)'),
+                         {'name': table.name, 'seq': top})
+            upgraded.append(table.name)
+    return upgraded
+
+
+# --- Read helpers spanning hot and archived rows ---
+
+def archived_totals(client_id=None):
+    """(total_invoiced, total_paid) over archived invoices, optionally for one client."""
+    q = db.session.query(func.coalesce(func.sum(ArchivedInvoice.amount), 0.0),
+                         func.coalesce(func.sum(ArchivedInvoice.paid), 0.0))
+    if client_id is not None:
+        q = q.filter(ArchivedInvoice.client_id == client_id)
+    invoiced, paid = q.one()
+    return invoiced, paid
+
+
+def archived_totals_by_client():
+    """Map client_id -> (total_invoiced, total_paid) over archived invoices."""
+    rows = (db.session.query(ArchivedInvoice.client_id,
+                             func.sum(ArchivedInvoice.amount),
+                             func.sum(ArchivedInvoice.paid))
+            .group_by(ArchivedInvoice.client_id).all())
+    return {cid: (invoiced or 0.0, paid or 0.0) for cid, invoiced, paid in rows}
+
+
+def client_invoices(client_id, include_archived=False):
+    """Invoices for a client, newest due date first; archived ones appended when asked."""
+    invoices = (Invoice.query.filter_by(client_id=client_id)
+                .order_by(Invoice.due_date.desc(), Invoice.id.desc()).all())
+    if include_archived:
+        invoices += (ArchivedInvoice.query.filter_by(client_id=client_id)
+                     .order_by(ArchivedInvoice.due_date.desc(), ArchivedInvoice.id.desc()).all())
+    return invoices
+
+
+def client_payments(client_id, include_archived=False):
+    """Payments for a client, newest first; archived ones appended when asked."""
+    payments = (Payment.query.join(Invoice).filter(Invoice.client_id == client_id)
+                .order_by(Payment.date.desc()).all())
+    if include_archived:
+        payments += (ArchivedPayment.query.join(ArchivedInvoice)
+                     .filter(ArchivedInvoice.client_id == client_id)
+                     .order_by(ArchivedPayment.date.desc()).all())
+    return payments
+
+
+def include_archived_requested(args):
+    """True when a request's query string asks for archived rows (``?include_archived=1``)."""
+    return args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+@archive_cli.command('run')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Archive invoices due before this date (default: ARCHIVE_AFTER_DAYS ago).')
+@click.option('--batch-size', type=int, help='Invoices moved per transaction.')
+def run_archive(before, batch_size):
+    """Archive paid invoices and their payments."""
+    cutoff = before.date() if before else None
+    invoices_moved, payments_moved = archive_closed_invoices(cutoff, batch_size)
+    click.echo(f'Archived {invoices_moved} invoices and {payments_moved} payments.')
+
+
+@archive_cli.command('upgrade-ids')
+def upgrade_ids():
+    """One-off: rebuild invoice/payment/event as AUTOINCREMENT tables (stop the app first)."""
+    upgraded = upgrade_id_sequences(db.engine)
+    if upgraded:
+        click.echo(f"Upgraded {', '.join(upgraded)}; ids are no longer reused.")
+    else:
+        click.echo('Nothing to do.')
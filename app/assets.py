@@ -0,0 +1,177 @@
+"""Fingerprinted, precompressed static assets.
+
+``flask assets build`` collects the JS/CSS under ``app/static`` and the
+top-level ``static`` folder, minifies them, writes content-hashed copies to
+``app/static/dist`` together with ``.gz`` (and ``.br`` when the optional
+``brotli`` package is installed) variants, and records the mapping in
+``manifest.json``.
+
+Templates call ``asset_url('js/view_clients.js')`` instead of
+``url_for('static', ...)``. Hashed files are served with far-future immutable
+cache headers and the best precompressed encoding the client accepts; before a
+build the source file is served with ``no-cache`` so development still works.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import Blueprint, abort, current_app, request, send_file, send_from_directory, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz variants are produced without it
+    brotli = None
+
+try:
+    import rjsmin
+    import rcssmin
+except ImportError:  # optional: fall back to the conservative minifiers below
+    rjsmin = rcssmin = None
+
+assets_bp = Blueprint('assets', __name__)
+assets_cli = AppGroup('assets', help='Build fingerprinted static assets.')
+
+ASSET_EXTENSIONS = ('.js', '.css')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def source_dirs(app):
+    """Folders assets are collected from, in lookup order."""
+    return [app.static_folder, os.path.join(app.root_path, '..', 'static')]
+
+
+def dist_dir(app):
+    return os.path.join(app.static_folder, 'dist')
+
+
+# --- Minification ---
+
+def minify_js(text):
+    if rjsmin:
+        return rjsmin.jsmin(text)
+    # Keep line breaks (automatic semicolon insertion); drop indentation, blank lines
+    # and whole-line // comments only.
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+def minify_css(text):
+    if rcssmin:
+        return rcssmin.cssmin(text)
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    return text.replace(';}', '}').strip() + '\n'
+
+
+# --- Build ---
+
+def iter_sources(app):
+    """Yield (logical name, path) for every collectable asset; earlier folders win."""
+    seen = set()
+    for root in source_dirs(app):
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != dist_dir(app)]
+            for filename in sorted(filenames):
+                if not filename.endswith(ASSET_EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, filename)
+                logical = os.path.relpath(path, root).replace(os.sep, '/')
+                if logical not in seen:
+                    seen.add(logical)
+                    yield logical, path
+
+
+def build_assets(app):
+    """Minify, hash and precompress every asset. Returns the new manifest."""
+    out_root = dist_dir(app)
+    manifest = {}
+    for logical, path in iter_sources(app):
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        data = (minify_js(text) if logical.endswith('.js') else minify_css(text)).encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(logical)
+        hashed = f'{stem}.{digest}{ext}'
+        target = os.path.join(out_root, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        with open(target, 'wb') as f:
+            f.write(data)
+        with open(target + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli:
+            with open(target + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+        manifest[logical] = hashed
+
+    with open(os.path.join(out_root, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(app):
+    path = os.path.join(dist_dir(app), 'manifest.json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# --- URLs and serving ---
+
+def asset_url(filename):
+    """url_for-compatible URL for an asset: the hashed copy when built, else the source."""
+    manifest = current_app.extensions['asset_manifest']
+    return url_for('assets.asset', filename=manifest.get(filename, filename))
+
+
+@assets_bp.route('/assets/<path:filename>')
+def asset(filename):
+    hashed = current_app.extensions['asset_hashed']
+    if filename not in hashed:
+        # Unbuilt source file (development): always revalidate
+        for root in source_dirs(current_app):
+            if os.path.isfile(os.path.join(root, filename)):
+                return send_from_directory(root, filename, max_age=0)
+        abort(404)
+
+    path = os.path.join(dist_dir(current_app), filename)
+    accepted = request.headers.get('Accept-Encoding', '')
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if candidate in accepted and os.path.isfile(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], conditional=True)
+    response.headers.pop('Content-Disposition', None)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def init_app(app):
+    manifest = load_manifest(app)
+    app.extensions['asset_manifest'] = manifest
+    app.extensions['asset_hashed'] = set(manifest.values())
+    app.jinja_env.globals['asset_url'] = asset_url
+
+
+@assets_cli.command('build')
+def build_command():
+    """Minify, fingerprint and precompress static assets."""
+    app = current_app._get_current_object()
+    manifest = build_assets(app)
+    init_app(app)
+    click.echo(f'Built {len(manifest)} assets into {dist_dir(app)}'
+               + ('' if brotli else ' (install brotli for .br variants)'))
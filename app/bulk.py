@@ -0,0 +1,121 @@
+"""Bulk invoice actions, each as a single transaction of set-based statements.
+
+``create_invoices`` inserts one invoice per client from a template with
+pre-allocated invoice numbers and a single multi-row INSERT. ``mark_paid``,
+``delete`` and ``change_due_date`` act on a selection of invoice ids with
+``INSERT ... SELECT`` / ``UPDATE ... WHERE id IN (...)`` rather than one
+request per invoice. Every function returns a summary dict for the response.
+"""
+from datetime import datetime
+
+from sqlalchemy import case, func, insert, literal, select, update
+
+from . import db
+from .deletion import delete_invoices
+from .events import publish_bulk
+from .jobs import enqueue_invoice_refreshes
+from .metrics import count_committed
+from .models import Client, Invoice, Payment
+
+ACTIONS = ('mark_paid', 'delete', 'due_date')
+
+
+def _commit():
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _existing_ids(invoice_ids):
+    return [row[0] for row in db.session.execute(
+        select(Invoice.id).where(Invoice.id.in_(set(invoice_ids))))]
+
+
+def create_invoices(client_ids, template):
+    """Create one invoice per client from ``template`` (the add_invoice form fields)."""
+    client_ids = [row[0] for row in db.session.execute(
+        select(Client.id).where(Client.id.in_(set(client_ids))).order_by(Client.id))]
+    if not client_ids:
+        return {'action': 'create', 'invoices': 0, 'amount': 0.0}
+
+    numbers = Invoice.allocate_invoice_nos(len(client_ids))
+    rows = [dict(template, invoice_no=number, client_id=client_id, paid=0.0, status='pending')
+            for client_id, number in zip(client_ids, numbers)]
+    db.session.execute(insert(Invoice), rows)
+
+    amount = template['amount']
+    publish_bulk('invoices_bulk', {client_id: {'revenue': amount, 'outstanding': amount, 'invoices': 1}
+                                   for client_id in client_ids}, action='create')
+    _commit()
+    count_committed(invoices=len(rows))
+    return {'action': 'create', 'invoices': len(rows), 'amount': round(amount * len(rows), 2),
+            'first_invoice_no': numbers[0], 'last_invoice_no': numbers[-1]}
+
+
+def mark_paid(invoice_ids):
+    """Mark invoices paid, recording each outstanding balance as a 'Marked paid' payment.
+
+    Like the single-invoice route, every invoice that gets a payment is queued
+    for a refresh_invoice job.
+    """
+    ids = _existing_ids(invoice_ids)
+    open_balance = Invoice.amount - func.coalesce(Invoice.paid, 0.0)
+    selected = Invoice.id.in_(ids) & (open_balance > 0)
+
+    settled_ids = db.session.scalars(select(Invoice.id).where(selected)).all()
+    per_client = {client_id: {'paid': balance, 'outstanding': -balance}
+                  for client_id, balance in db.session.execute(
+                      select(Invoice.client_id, func.sum(open_balance)).where(selected)
+                      .group_by(Invoice.client_id))}
+
+    # A balancing payment brings the running total to the full amount: the last installment
+    last_installment = case((func.lower(Invoice.payment_type).like('install%') & (Invoice.installments > 0),
+                             Invoice.installments), else_=None)
+    payments = db.session.execute(
+        insert(Payment).from_select(
+            ['invoice_id', 'amount', 'method', 'date', 'installment_number'],
+            select(Invoice.id, open_balance, literal('Marked paid'), literal(datetime.utcnow().date()),
+                   last_installment)
+            .where(selected))).rowcount
+    # Overpaid invoices keep their paid total (it must match the payment rows); only the status changes
+    updated = db.session.execute(
+        update(Invoice).where(Invoice.id.in_(ids))
+        .values(paid=case((open_balance > 0, Invoice.amount), else_=Invoice.paid), status='paid')
+        .execution_options(synchronize_session=False)).rowcount
+    enqueue_invoice_refreshes(settled_ids)
+
+    if per_client:
+        publish_bulk('invoices_bulk', per_client, action='mark_paid')
+    _commit()
+    collected = sum(totals['paid'] for totals in per_client.values())
+    count_committed(payments=payments, amount=collected)
+    return {'action': 'mark_paid', 'invoices': updated, 'payments': payments, 'amount': round(collected, 2)}
+
+
+def delete(invoice_ids):
+    """Delete the selected invoices and their payments."""
+    ids = _existing_ids(invoice_ids)
+    per_client = {}
+    for client_id, count, amount, paid in db.session.execute(
+            select(Invoice.client_id, func.count(Invoice.id), func.sum(Invoice.amount),
+                   func.sum(func.coalesce(Invoice.paid, 0.0)))
+            .where(Invoice.id.in_(ids)).group_by(Invoice.client_id)):
+        per_client[client_id] = {'revenue': -amount, 'paid': -paid, 'outstanding': -(amount - paid),
+                                 'invoices': -count}
+    if per_client:
+        # Committed together with the deletes below
+        publish_bulk('invoices_bulk', per_client, action='delete')
+    counts = delete_invoices(ids)
+    return {'action': 'delete', 'invoices': counts['invoices'], 'payments': counts['payments']}
+
+
+def change_due_date(invoice_ids, due_date):
+    """Move the selected invoices to a new due date."""
+    updated = db.session.execute(
+        update(Invoice).where(Invoice.id.in_(set(invoice_ids)))
+        .values(due_date=due_date)
+        .execution_options(synchronize_session=False)).rowcount
+    _commit()
+    return {'action': 'due_date', 'invoices': updated, 'due_date': due_date.isoformat()}
@@ -0,0 +1,64 @@
+"""Set-based deletion of clients and invoices.
+
+Everything that hangs off a client or invoice (payments, archived copies) is
+removed with a handful of ``DELETE ... WHERE`` statements inside a single
+transaction, instead of loading each row into the session and deleting it one
+by one. Every function accepts ``dry_run=True`` to only report row counts.
+
+Queued jobs are left alone: their handlers return early once the invoice or
+payment they refer to is gone, and finished jobs are pruned by app.jobs.
+"""
+from sqlalchemy import delete, func, select
+
+from . import db
+from .models import ArchivedInvoice, ArchivedPayment, Client, Event, Invoice, Payment
+
+
+def _run(plan, dry_run):
+    """Execute (or just count) a list of (label, model, where-clause) steps in order.
+
+    Returns a dict of label -> affected row count. Steps run children first so
+    foreign keys are never left dangling; the whole plan commits or rolls back together.
+    """
+    if dry_run:
+        return {label: db.session.query(func.count()).select_from(model).filter(where).scalar()
+                for label, model, where in plan}
+
+    counts = {}
+    try:
+        for label, model, where in plan:
+            result = db.session.execute(
+                delete(model).where(where).execution_options(synchronize_session=False))
+            counts[label] = result.rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # Objects already in the session may refer to deleted rows
+    db.session.expire_all()
+    return counts
+
+
+def delete_client_data(client_id, dry_run=False):
+    """Delete a client together with all its invoices, payments, archived rows and live events."""
+    invoice_ids = select(Invoice.id).where(Invoice.client_id == client_id)
+    archived_ids = select(ArchivedInvoice.id).where(ArchivedInvoice.client_id == client_id)
+    plan = [
+        ('payments', Payment, Payment.invoice_id.in_(invoice_ids)),
+        ('invoices', Invoice, Invoice.client_id == client_id),
+        ('archived_payments', ArchivedPayment, ArchivedPayment.invoice_id.in_(archived_ids)),
+        ('archived_invoices', ArchivedInvoice, ArchivedInvoice.client_id == client_id),
+        ('events', Event, Event.channel == f'client:{client_id}'),
+        ('clients', Client, Client.id == client_id),
+    ]
+    return _run(plan, dry_run)
+
+
+def delete_invoices(invoice_ids, dry_run=False):
+    """Delete the given hot invoices and all of their payments."""
+    invoice_ids = list(invoice_ids)
+    plan = [
+        ('payments', Payment, Payment.invoice_id.in_(invoice_ids)),
+        ('invoices', Invoice, Invoice.id.in_(invoice_ids)),
+    ]
+    return _run(plan, dry_run)
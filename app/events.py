@@ -0,0 +1,254 @@
+"""Live update events pushed to browsers over Server-Sent Events.
+
+Write routes call ``publish_*()`` before their commit, so an event row lands in
+the ``event`` table in the same transaction as the change it describes (and is
+visible to every gunicorn process). One poller thread per process reads new
+rows and fans them out to the in-process subscriber queues of open SSE
+connections, so the database sees one query per poll interval no matter how
+many browsers are connected.
+
+Channels are ``'owner'`` (everything) and ``'client:<id>'`` (one client's
+invoices and payments). Payloads are small deltas the page applies in place.
+Idle connections only cost a blocked queue read, but each one occupies a
+worker for as long as the page stays open. That is why the whole feature is
+off unless ``EVENTS_ENABLED`` is set, which needs a worker class that holds
+many idle connections (``gunicorn -k gevent`` or ``-k gthread``). On sync
+workers every open dashboard would pin a worker. While it is off, no event
+rows are written.
+"""
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Response, current_app
+from sqlalchemy import delete, func, insert, select
+
+from . import db
+from .models import Event
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+# --- Publishing ---
+
+def publish(channel, kind, **data):
+    """Add an event to the current session; it is delivered once the caller commits."""
+    if not current_app.config['EVENTS_ENABLED']:
+        return
+    db.session.add(Event(channel=channel, kind=kind, payload=json.dumps(data)))
+
+
+def _publish_both(client_id, kind, **data):
+    publish('owner', kind, **data)
+    publish(f'client:{client_id}', kind, **data)
+
+
+def _invoice_data(invoice):
+    return {
+        'id': invoice.id,
+        'invoice_no': invoice.invoice_no,
+        'client_id': invoice.client_id,
+        'status': invoice.status,
+        'amount': invoice.amount or 0.0,
+        'paid': invoice.paid or 0.0,
+    }
+
+
+def publish_payment(payment, invoice, removed=False):
+    """Payment recorded (or removed): totals move by its amount."""
+    amount = payment.amount or 0.0
+    sign = -1 if removed else 1
+    _publish_both(
+        invoice.client_id, 'payment_deleted' if removed else 'payment',
+        totals={'paid': sign * amount, 'outstanding': -sign * amount, 'payments': sign},
+        invoice=_invoice_data(invoice),
+        payment={
+            'client': invoice.client.name if invoice.client else '',
+            'invoice_no': invoice.invoice_no,
+            'installment': bool(invoice.payment_type and invoice.payment_type.lower().startswith('install')),
+            'amount': amount,
+            'method': payment.method,
+            'date': payment.date.strftime('%m/%d/%Y') if payment.date else '',
+        })
+
+
+def publish_invoice(invoice, kind, paid_delta=0.0):
+    """Invoice created, deleted or marked paid. ``paid_delta`` is the change in ``paid``."""
+    if not current_app.config['EVENTS_ENABLED']:
+        return
+    if invoice.id is None:
+        db.session.flush()
+    amount = invoice.amount or 0.0
+    paid = invoice.paid or 0.0
+    if kind == 'invoice_created':
+        totals = {'revenue': amount, 'outstanding': amount - paid, 'invoices': 1}
+    elif kind == 'invoice_deleted':
+        totals = {'revenue': -amount, 'paid': -paid, 'outstanding': -(amount - paid), 'invoices': -1}
+    else:
+        totals = {'paid': paid_delta, 'outstanding': -paid_delta}
+    _publish_both(invoice.client_id, kind, totals=totals, invoice=_invoice_data(invoice))
+
+
+def publish_bulk(kind, per_client, **data):
+    """Events for a bulk change: summed totals for the owner plus one event per client.
+
+    ``per_client`` maps client id -> totals delta. All rows go in one INSERT.
+    """
+    if not current_app.config['EVENTS_ENABLED']:
+        return
+    owner_totals = {}
+    for totals in per_client.values():
+        for name, value in totals.items():
+            owner_totals[name] = owner_totals.get(name, 0) + value
+    rows = [{'channel': 'owner', 'kind': kind, 'payload': json.dumps(dict(data, totals=owner_totals))}]
+    rows += [{'channel': f'client:{client_id}', 'kind': kind, 'payload': json.dumps(dict(data, totals=totals))}
+             for client_id, totals in per_client.items()]
+    db.session.execute(insert(Event), rows)
+
+
+# --- Fan-out ---
+
+class EventBus:
+    """Per-process poller that hands new event rows to subscriber queues."""
+
+    def __init__(self, app):
+        self.app = app
+        self.poll_interval = app.config['EVENTS_POLL_INTERVAL']
+        self.retention = timedelta(seconds=app.config['EVENTS_RETENTION_SECONDS'])
+        self._subscribers = {}  # channel -> set of queues
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        with app.app_context():
+            self.last_id = db.session.execute(select(func.max(Event.id))).scalar() or 0
+        self._thread = threading.Thread(target=self._run, name='event-bus', daemon=True)
+        self._thread.start()
+
+    def subscribe(self, channels):
+        q = queue.Queue(maxsize=self.app.config['EVENTS_QUEUE_SIZE'])
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(q)
+        return q
+
+    def unsubscribe(self, q, channels):
+        with self._lock:
+            for channel in channels:
+                subs = self._subscribers.get(channel)
+                if subs:
+                    subs.discard(q)
+                    if not subs:
+                        del self._subscribers[channel]
+
+    def connection_count(self):
+        with self._lock:
+            return len({id(q) for subs in self._subscribers.values() for q in subs})
+
+    def _dispatch(self, event):
+        with self._lock:
+            targets = list(self._subscribers.get(event.channel, ()))
+        message = format_event(event)
+        for q in targets:
+            try:
+                q.put_nowait((event.id, message))
+            except queue.Full:
+                pass  # slow client; it catches up via Last-Event-ID on reconnect
+
+    def _poll(self):
+        rows = db.session.execute(
+            select(Event).where(Event.id > self.last_id).order_by(Event.id).limit(500)
+        ).scalars().all()
+        for event in rows:
+            self._dispatch(event)
+            self.last_id = event.id
+        db.session.rollback()
+
+    def _prune(self):
+        cutoff = datetime.utcnow() - self.retention
+        db.session.execute(delete(Event).where(Event.created_at < cutoff))
+        db.session.commit()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        last_prune = 0.0
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self._poll()
+                    if time.monotonic() - last_prune > 60:
+                        self._prune()
+                        last_prune = time.monotonic()
+            except Exception:
+                self.app.logger.exception('Event bus poll failed')
+            self._stop.wait(self.poll_interval)
+
+
+def get_bus():
+    """Process-wide event bus; the poller thread starts with the first subscriber."""
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = EventBus(current_app._get_current_object())
+        return _bus
+
+
+# --- SSE ---
+
+def format_event(event):
+    return f'id: {event.id}\nevent: {event.kind}\ndata: {event.payload}\n\n'
+
+
+def missed_events(channels, last_event_id):
+    """Events a reconnecting browser missed since ``last_event_id``."""
+    return (Event.query.filter(Event.channel.in_(channels), Event.id > last_event_id)
+            .order_by(Event.id).limit(current_app.config['EVENTS_QUEUE_SIZE']).all())
+
+
+def sse_response(channels, last_event_id=None):
+    """Streaming text/event-stream response for ``channels``.
+
+    The generator holds no request context or database connection: missed
+    events are read up front, after which it only waits on its queue.
+    """
+    bus = get_bus()
+    q = bus.subscribe(channels)
+    backlog = []
+    if last_event_id is not None:
+        backlog = [(e.id, format_event(e)) for e in missed_events(channels, last_event_id)]
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+
+    def stream():
+        sent = last_event_id or 0
+        try:
+            yield 'retry: 3000\n\n'
+            for event_id, message in backlog:
+                sent = event_id
+                yield message
+            while True:
+                try:
+                    event_id, message = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if event_id > sent:  # skip anything already replayed from the backlog
+                    sent = event_id
+                    yield message
+        finally:
+            bus.unsubscribe(q, channels)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def last_event_id(request):
+    """Last-Event-ID sent by a reconnecting EventSource, if any."""
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
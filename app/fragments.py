@@ -0,0 +1,71 @@
+"""Fragment caching for the large list templates.
+
+Rows and cards are rendered from their own small templates under
+``templates/fragments/`` and cached in-process, keyed by the fragment name plus
+a version tuple built from every value the fragment displays. When any of
+those values change the key changes, so stale entries are never served and
+simply age out of the LRU.
+
+Also installs a persistent Jinja bytecode cache so templates are not
+recompiled on every worker start.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered fragments."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def fragment(template_name, version, **context):
+    """Render ``template_name`` with ``context``, reusing the cached HTML for the same version."""
+    cache = current_app.extensions['fragment_cache']
+    key = (template_name, version)
+    html = cache.get(key)
+    if html is None:
+        html = Markup(current_app.jinja_env.get_template(template_name).render(**context))
+        cache.set(key, html)
+    return html
+
+
+def init_app(app):
+    app.extensions['fragment_cache'] = FragmentCache(app.config['FRAGMENT_CACHE_SIZE'])
+    app.jinja_env.globals['fragment'] = fragment
+
+    cache_dir = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
@@ -0,0 +1,242 @@
+"""Local, persistent background job queue.
+
+Jobs live in the ``job`` table, so they are enqueued in the same transaction as
+the write that produced them and survive restarts. Worker threads claim jobs
+with a conditional UPDATE (safe across threads and gunicorn processes), retry
+failures with exponential backoff and give up after ``max_attempts``. A claim
+is a lease: a job still ``running`` ``JOBS_LEASE_SECONDS`` after it was claimed
+(its worker died with the process) is claimed again, counting as an attempt.
+Idle workers delete ``done`` jobs older than ``JOBS_KEEP_DONE_SECONDS``; failed
+jobs are kept for inspection.
+
+Routes call ``enqueue()`` before their commit; handlers are registered with
+``@job_handler('name')`` and receive the payload as keyword arguments.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, insert, or_, select, update
+
+from . import db
+from .models import Invoice, Job
+
+jobs_cli = AppGroup('jobs', help='Run and inspect the background job queue.')
+
+HANDLERS = {}
+
+_worker_lock = threading.Lock()
+_worker_started = False
+
+PRUNE_INTERVAL = 60  # seconds between prune passes of an idle worker
+
+
+def job_handler(name):
+    """Register the decorated function as the handler for jobs called ``name``."""
+    def decorator(f):
+        HANDLERS[name] = f
+        return f
+    return decorator
+
+
+def enqueue(name, dedupe_key=None, delay=0, **payload):
+    """Add a job to the current session; it becomes visible when the caller commits.
+
+    If ``dedupe_key`` is given and a job with that key is still pending or
+    running, no new job is created and that one is returned instead.
+    """
+    if dedupe_key:
+        existing = (Job.query.filter(Job.dedupe_key == dedupe_key,
+                                     Job.status.in_(('pending', 'running')))
+                    .first())
+        if existing:
+            return existing
+    job = Job(name=name, dedupe_key=dedupe_key, payload=json.dumps(payload),
+              max_attempts=current_app.config['JOBS_MAX_ATTEMPTS'],
+              run_after=datetime.utcnow() + timedelta(seconds=delay))
+    db.session.add(job)
+    return job
+
+
+def enqueue_many(name, payloads):
+    """Set-based ``enqueue()`` for bulk actions: one SELECT and one multi-row INSERT.
+
+    ``payloads`` maps dedupe key -> payload dict; keys with a pending or running
+    job are skipped. Returns the number of jobs added.
+    """
+    queued = set(db.session.scalars(
+        select(Job.dedupe_key).where(Job.dedupe_key.in_(list(payloads)),
+                                     Job.status.in_(('pending', 'running')))))
+    now = datetime.utcnow()
+    rows = [{'name': name, 'dedupe_key': key, 'payload': json.dumps(payload),
+             'max_attempts': current_app.config['JOBS_MAX_ATTEMPTS'], 'run_after': now}
+            for key, payload in payloads.items() if key not in queued]
+    if rows:
+        db.session.execute(insert(Job), rows)
+    return len(rows)
+
+
+def claim_next():
+    """Atomically mark the next due (or lease-expired) job as running and return it (or None)."""
+    now = datetime.utcnow()
+    lease_expired = now - timedelta(seconds=current_app.config['JOBS_LEASE_SECONDS'])
+    while True:
+        job = (Job.query.filter(or_(and_(Job.status == 'pending', Job.run_after <= now),
+                                    and_(Job.status == 'running', Job.updated_at < lease_expired)))
+               .order_by(Job.id).first())
+        if job is None:
+            db.session.rollback()
+            return None
+        values = {'status': 'running', 'attempts': Job.attempts + 1, 'updated_at': now}
+        if job.status == 'running':
+            values['last_error'] = 'Lease expired: worker stopped while running the job'
+            if job.attempts >= job.max_attempts:
+                values.update(status='failed', attempts=Job.attempts)
+        # Only succeeds if nobody claimed (or finished) the job since it was read
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.status == job.status, Job.updated_at == job.updated_at)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            db.session.refresh(job)
+            if job.status == 'running':
+                return job
+            current_app.logger.error('Job %s (%s) failed: lease expired on the last attempt',
+                                     job.id, job.name)
+        # Another worker got there first, or the job was given up; try the next one
+
+
+def run_job(job):
+    """Run a claimed job, recording success, a scheduled retry or final failure."""
+    try:
+        handler = HANDLERS[job.name]
+        handler(**json.loads(job.payload or '{}'))
+        job.status = 'done'
+        job.last_error = None
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        job.last_error = f'{type(e).__name__}: {e}'
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.run_after = datetime.utcnow() + timedelta(seconds=2 ** job.attempts)
+        db.session.commit()
+        current_app.logger.exception('Job %s (%s) failed', job.id, job.name)
+
+
+def prune_done():
+    """Delete ``done`` jobs finished more than JOBS_KEEP_DONE_SECONDS ago. Returns the count."""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOBS_KEEP_DONE_SECONDS'])
+    deleted = db.session.execute(
+        delete(Job).where(Job.status == 'done', Job.updated_at < cutoff)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def work(app, stop_event, poll_interval):
+    """Worker loop: process due jobs until ``stop_event`` is set, pruning while idle."""
+    next_prune = time.monotonic()
+    while not stop_event.is_set():
+        with app.app_context():
+            job = claim_next()
+            if job is not None:
+                run_job(job)
+                continue
+            if time.monotonic() >= next_prune:
+                prune_done()
+                next_prune = time.monotonic() + PRUNE_INTERVAL
+        stop_event.wait(poll_interval)
+
+
+def start_workers(app, threads=None):
+    """Start daemon worker threads for this process. Returns the stop event."""
+    threads = app.config['JOBS_WORKER_THREADS'] if threads is None else threads
+    stop_event = threading.Event()
+    for i in range(threads):
+        t = threading.Thread(target=work, name=f'job-worker-{i}', daemon=True,
+                             args=(app, stop_event, app.config['JOBS_POLL_INTERVAL']))
+        t.start()
+    return stop_event
+
+
+def init_app(app):
+    """Start in-process workers lazily on the first request of each web process."""
+    @app.before_request
+    def _ensure_workers():
+        global _worker_started
+        if _worker_started or not app.config['JOBS_WORKER_THREADS']:
+            return
+        with _worker_lock:
+            if not _worker_started:
+                start_workers(app)
+                _worker_started = True
+
+
+def status_counts():
+    """Map job status -> number of jobs."""
+    rows = db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all()
+    return dict(rows)
+
+
+# --- Handlers ---
+
+@job_handler('refresh_invoice')
+def refresh_invoice(invoice_id):
+    """Renumber installments and recompute the status of an invoice after a payment change."""
+    invoice = db.session.get(Invoice, invoice_id)
+    if invoice is None:
+        return  # deleted since the job was queued
+    invoice.renumber_installments()
+    invoice.refresh_status()
+
+
+def enqueue_invoice_refresh(invoice_id):
+    """Queue a (deduplicated) refresh_invoice job for an invoice."""
+    return enqueue('refresh_invoice', dedupe_key=f'refresh_invoice:{invoice_id}',
+                   invoice_id=invoice_id)
+
+
+def enqueue_invoice_refreshes(invoice_ids):
+    """Queue (deduplicated) refresh_invoice jobs for many invoices at once."""
+    return enqueue_many('refresh_invoice', {f'refresh_invoice:{invoice_id}': {'invoice_id': invoice_id}
+                                            for invoice_id in invoice_ids})
+
+
+# --- CLI ---
+
+@jobs_cli.command('worker')
+@click.option('--threads', type=int, default=2, show_default=True, help='Worker threads.')
+def run_worker(threads):
+    """Run a dedicated worker process until interrupted."""
+    app = current_app._get_current_object()
+    stop_event = start_workers(app, threads)
+    click.echo(f'Job worker running with {threads} threads. Press Ctrl+C to stop.')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_event.set()
+
+
+@jobs_cli.command('status')
+def show_status():
+    """Print job counts per status."""
+    for status, count in sorted(status_counts().items()):
+        click.echo(f'{status}: {count}')
+
+
+@jobs_cli.command('prune')
+def prune():
+    """Delete finished jobs older than JOBS_KEEP_DONE_SECONDS."""
+    click.echo(f'Deleted {prune_done()} finished jobs.')
@@ -0,0 +1,193 @@
+"""Ledger integrity checker: cached invoice fields vs. the payment rows.
+
+``Invoice.paid``, ``Invoice.status`` and ``Payment.installment_number`` are
+maintained incrementally by the write routes and the job queue, so they can
+drift. ``flask ledger check`` recomputes them from the payments and reports
+(or, with ``--repair``, fixes) every mismatch.
+
+Invoices are split into id ranges that are checked in parallel by a process
+pool. Each worker opens its own engine and handles a whole range with two
+set-based queries: a grouped ``SUM(payment.amount)`` per invoice, and a
+running ``SUM() OVER`` window for installment numbers. Repairs are written by
+the worker that found them, guarded by the value it read, so a payment
+recorded in the meantime is never overwritten.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, create_engine, func, select, update
+
+from . import db
+from .models import Invoice, Payment, installment_number_for, status_for
+
+ledger_cli = AppGroup('ledger', help='Verify cached invoice totals against payments.')
+
+TOLERANCE = 0.005
+SAMPLE_SIZE = 20
+
+_engine = None
+
+
+def _init_worker(url):
+    """Process pool initializer: one engine per worker process."""
+    global _engine
+    connect_args = {'timeout': 30} if url.startswith('sqlite') else {}
+    _engine = create_engine(url, connect_args=connect_args)
+
+
+def _status_ok(stored, expected):
+    # 'overdue' is a display state of an unpaid invoice
+    return stored == expected or (stored == 'overdue' and expected != 'paid')
+
+
+def check_totals(conn, lo, hi):
+    """[(invoice_id, stored_paid, actual_paid, stored_status, expected_status)] for mismatches."""
+    inv, pay = Invoice.__table__, Payment.__table__
+    sums = (select(pay.c.invoice_id, func.sum(pay.c.amount).label('total'))
+            .where(pay.c.invoice_id.between(lo, hi))
+            .group_by(pay.c.invoice_id)
+            .subquery())
+    stmt = (select(inv.c.id, inv.c.amount, inv.c.paid, inv.c.status,
+                   func.coalesce(sums.c.total, 0.0).label('actual'))
+            .select_from(inv.outerjoin(sums, sums.c.invoice_id == inv.c.id))
+            .where(inv.c.id.between(lo, hi)))
+    mismatches = []
+    for row in conn.execute(stmt):
+        actual = round(row.actual, 2)
+        expected = status_for(actual, row.amount or 0.0)
+        if abs((row.paid or 0.0) - actual) > TOLERANCE or not _status_ok(row.status, expected):
+            mismatches.append((row.id, row.paid, actual, row.status, expected))
+    return mismatches
+
+
+def check_installments(conn, lo, hi):
+    """[(payment_id, stored_number, expected_number)] for installment invoices in the range."""
+    inv, pay = Invoice.__table__, Payment.__table__
+    running = func.sum(pay.c.amount).over(partition_by=pay.c.invoice_id,
+                                          order_by=(pay.c.date, pay.c.id), rows=(None, 0))
+    stmt = (select(pay.c.id, pay.c.installment_number, inv.c.amount, inv.c.installments,
+                   running.label('running'))
+            .join(inv, inv.c.id == pay.c.invoice_id)
+            .where(inv.c.id.between(lo, hi),
+                   func.lower(inv.c.payment_type).like('install%'),
+                   inv.c.installments > 0))
+    mismatches = []
+    for row in conn.execute(stmt):
+        # Same rounding as Invoice.installment_amount
+        per_installment = round((row.amount or 0.0) / row.installments, 2)
+        if per_installment <= 0:
+            continue
+        expected = installment_number_for(row.running or 0.0, per_installment, row.installments)
+        if row.installment_number != expected:
+            mismatches.append((row.id, row.installment_number, expected))
+    return mismatches
+
+
+def repair(conn, totals, installments):
+    """Apply fixes with executemany UPDATEs guarded by the values that were checked."""
+    inv, pay = Invoice.__table__, Payment.__table__
+    fixed = 0
+    if totals:
+        stmt = (update(inv)
+                .where(inv.c.id == bindparam('b_id'),
+                       inv.c.paid.is_not_distinct_from(bindparam('b_old_paid')),
+                       inv.c.status.is_not_distinct_from(bindparam('b_old_status')))
+                .values(paid=bindparam('b_paid'), status=bindparam('b_status')))
+        fixed += conn.execute(stmt, [
+            {'b_id': i, 'b_old_paid': old_paid, 'b_paid': paid, 'b_old_status': old_status, 'b_status': status}
+            for i, old_paid, paid, old_status, status in totals]).rowcount
+    if installments:
+        stmt = (update(pay)
+                .where(pay.c.id == bindparam('b_id'),
+                       pay.c.installment_number.is_not_distinct_from(bindparam('b_old')))
+                .values(installment_number=bindparam('b_new')))
+        fixed += conn.execute(stmt, [{'b_id': i, 'b_old': old, 'b_new': new}
+                                     for i, old, new in installments]).rowcount
+    return fixed
+
+
+def check_range(lo, hi, fix=False, engine=None):
+    """Check invoices with lo <= id <= hi. Runs inside a worker process."""
+    engine = engine or _engine
+    with engine.begin() as conn:
+        totals = check_totals(conn, lo, hi)
+        installments = check_installments(conn, lo, hi)
+        fixed = repair(conn, totals, installments) if fix else 0
+        checked = conn.execute(select(func.count()).select_from(Invoice.__table__)
+                               .where(Invoice.__table__.c.id.between(lo, hi))).scalar()
+    return {
+        'checked': checked,
+        'totals': len(totals),
+        'installments': len(installments),
+        'fixed': fixed,
+        'samples': (totals[:SAMPLE_SIZE], installments[:SAMPLE_SIZE]),
+    }
+
+
+def id_ranges(chunk_size):
+    """Inclusive (lo, hi) id ranges covering every invoice."""
+    lo, hi = db.session.query(func.min(Invoice.id), func.max(Invoice.id)).one()
+    if lo is None:
+        return []
+    return [(start, min(start + chunk_size - 1, hi)) for start in range(lo, hi + 1, chunk_size)]
+
+
+def check_ledger(chunk_size=10000, workers=None, fix=False, progress=None):
+    """Check (and optionally repair) the whole ledger. Returns summed counts and samples."""
+    ranges = id_ranges(chunk_size)
+    summary = {'checked': 0, 'totals': 0, 'installments': 0, 'fixed': 0,
+               'samples': ([], []), 'chunks': len(ranges)}
+
+    def add(result):
+        for key in ('checked', 'totals', 'installments', 'fixed'):
+            summary[key] += result[key]
+        for mine, theirs in zip(summary['samples'], result['samples']):
+            mine.extend(theirs[:SAMPLE_SIZE - len(mine)])
+        if progress:
+            progress(result)
+
+    db.session.remove()
+    if workers == 0:
+        # Inline, on the app's own engine (debugging, tiny databases)
+        for lo, hi in ranges:
+            add(check_range(lo, hi, fix, engine=db.engine))
+        return summary
+
+    url = db.engine.url.render_as_string(hide_password=False)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_worker, initargs=(url,)) as pool:
+        futures = [pool.submit(check_range, lo, hi, fix) for lo, hi in ranges]
+        for future in as_completed(futures):
+            add(future.result())
+    return summary
+
+
+# --- CLI ---
+
+@ledger_cli.command('check')
+@click.option('--repair', 'fix', is_flag=True, help='Fix mismatches instead of only reporting them.')
+@click.option('--chunk-size', type=int, default=10000, show_default=True, help='Invoice ids per chunk.')
+@click.option('--workers', type=int, default=None,
+              help='Worker processes (default: CPU count; 0 runs inline).')
+@click.pass_context
+def check_command(ctx, fix, chunk_size, workers):
+    """Compare Invoice.paid/status and installment numbers with the payment rows."""
+    with click.progressbar(length=len(id_ranges(chunk_size)), label='Checking ledger') as bar:
+        summary = check_ledger(chunk_size, workers, fix, progress=lambda result: bar.update(1))
+
+    click.echo(f"Checked {summary['checked']} invoices in {summary['chunks']} chunks: "
+               f"{summary['totals']} paid/status mismatches, "
+               f"{summary['installments']} installment number mismatches.")
+    totals, installments = summary['samples']
+    for invoice_id, old_paid, paid, old_status, status in totals:
+        click.echo(f'  invoice {invoice_id}: paid {old_paid} -> {paid}, status {old_status} -> {status}')
+    for payment_id, old, new in installments:
+        click.echo(f'  payment {payment_id}: installment {old} -> {new}')
+
+    if fix:
+        click.echo(f"Repaired {summary['fixed']} rows.")
+    elif summary['totals'] or summary['installments']:
+        click.echo('Run with --repair to fix them.')
+        ctx.exit(1)
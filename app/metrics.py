@@ -0,0 +1,420 @@
+"""Prometheus-style metrics shared across gunicorn worker processes.
+
+Each process keeps its counters, gauges and histograms in memory; recording a
+sample is a dict update under a lock, so request instrumentation costs a few
+microseconds. A background thread writes a snapshot of the process's values to
+``METRICS_DIR/<pid>-<start>.json`` every ``METRICS_FLUSH_INTERVAL`` seconds,
+and ``/metrics`` sums the snapshots of every process into the text exposition
+format. The process start time in the name keeps a recycled worker that gets a
+reused PID from overwriting a dead worker's file. When a scrape finds the file
+of an exited process, its counters and histograms are folded into
+``retired.json`` and the file is removed, so totals never go backwards and
+dead files are not re-read forever; gauges of exited processes are dropped.
+
+``/metrics`` requires ``Authorization: Bearer $AIS_METRICS_TOKEN`` when a
+token is configured, and an owner login otherwise.
+"""
+import atexit
+import bisect
+import hmac
+import json
+import os
+import threading
+import time
+from time import perf_counter
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from flask import Blueprint, Response, abort, current_app, g, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+metrics_bp = Blueprint('metrics', __name__)
+
+REGISTRY = {}
+COLLECTORS = []
+
+RETIRED = 'retired.json'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+_flusher_lock = threading.Lock()
+_flusher_started = False
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(labels): value for labels, value in self._values.items()}
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, labels=()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set_total(self, value, labels=()):
+        """Mirror a total kept elsewhere (e.g. a cache's own hit counter)."""
+        with self._lock:
+            self._values[labels] = value
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1, labels=()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, amount=1, labels=()):
+        self.inc(-amount, labels)
+
+    def set(self, value, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # per-bucket (non-cumulative) counts, then +Inf, sum
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[i] += 1
+            state[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(labels): list(state) for labels, state in self._values.items()}
+
+
+# --- Metrics ---
+
+REQUESTS = Counter('ais_http_requests_total', 'HTTP requests handled.',
+                   ('blueprint', 'endpoint', 'method', 'status'))
+LATENCY = Histogram('ais_http_request_duration_seconds', 'Time to produce a response.',
+                    ('blueprint', 'endpoint'))
+IN_FLIGHT = Gauge('ais_http_requests_in_flight', 'Requests currently being handled.')
+POOL_CHECKOUT = Histogram('ais_db_pool_checkout_seconds',
+                          'Time to get a connection from the pool, including waits.',
+                          buckets=POOL_BUCKETS)
+POOL_CHECKED_OUT = Gauge('ais_db_pool_checked_out', 'Connections currently checked out.', ('bind',))
+POOL_SIZE = Gauge('ais_db_pool_size', 'Configured pool size.', ('bind',))
+CACHE_LOOKUPS = Counter('ais_cache_lookups_total', 'Cache lookups by result.', ('cache', 'result'))
+PAYMENTS = Counter('ais_payments_recorded_total', 'Payments committed.')
+PAYMENT_AMOUNT = Counter('ais_payments_amount_total', 'Sum of committed payment amounts.')
+INVOICES = Counter('ais_invoices_created_total', 'Invoices committed.')
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout takes."""
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT.observe(perf_counter() - start)
+
+
+def collector(f):
+    """Register ``f`` to refresh mirrored values right before each snapshot."""
+    COLLECTORS.append(f)
+    return f
+
+
+# --- Business counters (committed rows only) ---
+
+def _track_inserts(session, flush_context, instances):
+    from .models import Invoice, Payment
+    pending = session.info.setdefault('metrics_pending', [0, 0.0, 0])
+    for obj in session.new:
+        if isinstance(obj, Payment):
+            pending[0] += 1
+            pending[1] += obj.amount or 0.0
+        elif isinstance(obj, Invoice):
+            pending[2] += 1
+
+
+def _count_committed(session):
+    pending = session.info.pop('metrics_pending', None)
+    if pending:
+        count_committed(payments=pending[0], amount=pending[1], invoices=pending[2])
+
+
+def _discard_pending(session, previous_transaction):
+    session.info.pop('metrics_pending', None)
+
+
+def count_committed(payments=0, amount=0.0, invoices=0):
+    """Count rows inserted outside the ORM unit of work (bulk inserts)."""
+    if payments:
+        PAYMENTS.inc(payments)
+        PAYMENT_AMOUNT.inc(amount)
+    if invoices:
+        INVOICES.inc(invoices)
+
+
+# --- Snapshots and aggregation ---
+
+def metrics_dir(app):
+    return app.config['METRICS_DIR']
+
+
+def _process_start(pid):
+    """Start time of ``pid`` in clock ticks since boot (Linux), or 0 when unknown."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return int(f.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def snapshot_name(pid=None):
+    pid = pid or os.getpid()
+    return f'{pid}-{_process_start(pid)}.json'
+
+
+def write_snapshot(app):
+    """Write this process's current values to ``METRICS_DIR/<pid>-<start>.json``."""
+    with app.app_context():
+        for f in COLLECTORS:
+            try:
+                f(app)
+            except Exception:
+                app.logger.exception('Metrics collector %s failed', f.__name__)
+    data = {name: {'type': m.type, 'help': m.documentation, 'labels': m.labelnames,
+                   'buckets': getattr(m, 'buckets', None), 'samples': m.snapshot()}
+            for name, m in REGISTRY.items()}
+    _write_json(os.path.join(metrics_dir(app), snapshot_name()), data)
+
+
+def _write_json(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(filename):
+    """True while the process that wrote ``<pid>-<start>.json`` is still running."""
+    pid, _, start = filename[:-5].partition('-')
+    try:
+        pid, start = int(pid), int(start or 0)
+        os.kill(pid, 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    # A different process that got the same PID is not the writer
+    return start in (0, _process_start(pid))
+
+
+def _merge(merged, data, gauges=True):
+    for name, metric in data.items():
+        if metric['type'] == 'gauge' and not gauges:
+            continue
+        target = merged.setdefault(name, dict(metric, samples={}))
+        for labels, value in metric['samples'].items():
+            current = target['samples'].get(labels)
+            if current is None:
+                target['samples'][labels] = value
+            elif isinstance(value, list):
+                target['samples'][labels] = [a + b for a, b in zip(current, value)]
+            else:
+                target['samples'][labels] = current + value
+    return merged
+
+
+def retire(folder, filenames):
+    """Fold the counters and histograms of exited processes into RETIRED and delete their files."""
+    with open(os.path.join(folder, 'retired.lock'), 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        retired = _read_json(os.path.join(folder, RETIRED)) or {}
+        paths = []
+        for filename in filenames:
+            # Gone already if a concurrent scrape retired it first
+            data = _read_json(os.path.join(folder, filename))
+            if data is not None:
+                _merge(retired, data, gauges=False)
+                paths.append(os.path.join(folder, filename))
+        if paths:
+            _write_json(os.path.join(folder, RETIRED), retired)
+            for path in paths:
+                os.remove(path)
+
+
+def aggregate(app):
+    """Merge every process snapshot into {name: metric dict with summed samples}."""
+    folder = metrics_dir(app)
+    snapshots = [name for name in os.listdir(folder) if name.endswith('.json') and name != RETIRED]
+    dead = [name for name in snapshots if not _alive(name)]
+    if dead:
+        retire(folder, dead)
+
+    merged = {}
+    for filename in [RETIRED] + [name for name in snapshots if name not in dead]:
+        data = _read_json(os.path.join(folder, filename))
+        if data is not None:
+            _merge(merged, data)
+    return merged
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition(merged):
+    """Render merged metrics in the Prometheus text format."""
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key in sorted(metric['samples']):
+            labels = json.loads(key)
+            value = metric['samples'][key]
+            if metric['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(metric['labels'], labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric['buckets']) + ['+Inf'], value[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f"{name}_bucket{_format_labels(metric['labels'], labels, [('le', le)])} {cumulative}")
+            plain = _format_labels(metric['labels'], labels)
+            lines.append(f'{name}_sum{plain} {_format_value(value[-1])}')
+            lines.append(f'{name}_count{plain} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(401)
+    elif not (current_user.is_authenticated and current_user.role == 'owner'):
+        abort(403)
+    app = current_app._get_current_object()
+    write_snapshot(app)
+    return Response(exposition(aggregate(app)), mimetype='text/plain; version=0.0.4')
+
+
+# --- Collectors ---
+
+@collector
+def _pool_stats(app):
+    for key, engine in app.extensions['sqlalchemy'].engines.items():
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            bind = key or 'primary'
+            POOL_CHECKED_OUT.set(pool.checkedout(), (bind,))
+            POOL_SIZE.set(pool.size(), (bind,))
+
+
+@collector
+def _fragment_cache_stats(app):
+    cache = app.extensions.get('fragment_cache')
+    if cache is not None:
+        CACHE_LOOKUPS.set_total(cache.hits, ('fragment', 'hit'))
+        CACHE_LOOKUPS.set_total(cache.misses, ('fragment', 'miss'))
+
+
+# --- Wiring ---
+
+def _flush_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_snapshot(app)
+        except Exception:
+            app.logger.exception('Metrics flush failed')
+
+
+def start_flusher(app):
+    global _flusher_started
+    with _flusher_lock:
+        if _flusher_started:
+            return
+        threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True,
+                         args=(app, app.config['METRICS_FLUSH_INTERVAL'])).start()
+        atexit.register(write_snapshot, app)
+        _flusher_started = True
+
+
+def init_app(app, db):
+    if not app.config['METRICS_ENABLED']:
+        return
+    os.makedirs(metrics_dir(app), exist_ok=True)
+    app.register_blueprint(metrics_bp)
+
+    event.listen(db.session, 'before_flush', _track_inserts)
+    event.listen(db.session, 'after_commit', _count_committed)
+    event.listen(db.session, 'after_soft_rollback', _discard_pending)
+
+    @app.before_request
+    def _start_timer():
+        if not _flusher_started:
+            start_flusher(app)
+        g.metrics_start = perf_counter()
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _observe(exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        IN_FLIGHT.dec()
+        blueprint = request.blueprint or ''
+        endpoint = request.endpoint or 'none'
+        status = g.pop('metrics_status', 500)
+        REQUESTS.inc(labels=(blueprint, endpoint, request.method, str(status)))
+        LATENCY.observe(perf_counter() - start, (blueprint, endpoint))
@@ -1,9 +1,9 @@
 from . import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import date
+from datetime import date, datetime
 from sqlalchemy import event
 from math import ceil # Ensure 'ceil' is available
+from .passwords import hash_password, verify_and_upgrade
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -12,10 +12,17 @@ class User(db.Model, UserMixin):
     role = db.Column(db.String(20), default='client')  # 'owner' or 'client'
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Verify a password, upgrading the stored hash if it uses outdated parameters.
+
+        The caller commits; an upgraded hash is only persisted on success.
+        """
+        valid, new_hash = verify_and_upgrade(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return valid
 
 
 class Client(db.Model):
@@ -27,15 +34,18 @@ class Client(db.Model):
     tax_id = db.Column(db.String(50))
     address = db.Column(db.String(250))
     invoices = db.relationship('Invoice', backref='client', lazy=True)
+    archived_invoices = db.relationship('ArchivedInvoice', backref='client', lazy=True)
 
     def total_outstanding(self):
         return sum(inv.amount - (inv.paid or 0) for inv in self.invoices)
 
 
 class Invoice(db.Model):
+    # Ids are never reused: archived invoices keep theirs (see app.archive)
+    __table_args__ = {'sqlite_autoincrement': True}
     id = db.Column(db.Integer, primary_key=True)
     invoice_no = db.Column(db.String(50), unique=True, nullable=False)
-    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False, index=True)
     description = db.Column(db.String(250))
     amount = db.Column(db.Float, nullable=False, default=0.0)
     payment_type = db.Column(db.String(50), default='Full Payment')  # 'Full Payment' or 'Installment'
@@ -59,14 +69,16 @@ class Invoice(db.Model):
     def installments_paid(self):
         """Estimate how many installments have been paid."""
         explicit = {int(n) for n in (p.installment_number for p in self.payments) if n}
-        explicit_count = len(explicit)
+        total_paid = sum((p.amount or 0) for p in self.payments)
+        return self.installments_paid_from(len(explicit), total_paid)
 
+    def installments_paid_from(self, explicit_count, total_paid):
+        """installments_paid() from pre-aggregated payment stats (see utils.payment_stats)."""
         try:
             per_inst = float(self.installment_amount or 0)
         except Exception:
             per_inst = 0.0
 
-        total_paid = sum((p.amount or 0) for p in self.payments)
         amount_based = 0
         if per_inst > 0 and self.installments and self.installments > 0 and total_paid > 0:
             amount_based = int(ceil(total_paid / per_inst))
@@ -79,12 +91,38 @@ class Invoice(db.Model):
     @property
     def installments_display(self):
         """Return a display-friendly count for installments paid."""
-        paid_count = self.installments_paid()
-        total_paid = sum((p.amount or 0) for p in self.payments) or (self.paid or 0)
-        if paid_count == 0 and total_paid > 0:
+        explicit = {int(n) for n in (p.installment_number for p in self.payments) if n}
+        total_paid = sum((p.amount or 0) for p in self.payments)
+        return self.installments_display_from(len(explicit), total_paid)
+
+    def installments_display_from(self, explicit_count, total_paid):
+        """installments_display from pre-aggregated payment stats (see utils.payment_stats)."""
+        paid_count = self.installments_paid_from(explicit_count, total_paid)
+        if paid_count == 0 and (total_paid or (self.paid or 0)) > 0:
             return 1
         return paid_count
 
+    def renumber_installments(self):
+        """Backfill installment_number on this invoice's payments in chronological order."""
+        if not (self.payment_type and self.payment_type.lower().startswith('install')):
+            return
+        try:
+            per_inst = float(self.installment_amount or 0)
+        except Exception:
+            per_inst = 0.0
+        if per_inst <= 0:
+            return
+
+        max_inst = int(self.installments or 0)
+        running = 0.0
+        for p in Payment.query.filter_by(invoice_id=self.id).order_by(Payment.date, Payment.id):
+            running += (p.amount or 0)
+            p.installment_number = installment_number_for(running, per_inst, max_inst)
+
+    def refresh_status(self):
+        """Recompute status from the cached paid amount."""
+        self.status = status_for(self.paid or 0, self.amount)
+
     def installments_remaining(self):
         """Remaining installments based on total vs paid."""
         return max(self.installments - self.installments_paid(), 0)
@@ -103,23 +141,46 @@ class Invoice(db.Model):
     @staticmethod
     def generate_invoice_no():
         """Generate sequential invoice numbers like INV-2025-001."""
+        return Invoice.allocate_invoice_nos(1)[0]
+
+    @staticmethod
+    def allocate_invoice_nos(count):
+        """Reserve ``count`` consecutive invoice numbers following the last one issued this year."""
         year = date.today().year
-        last_invoice = Invoice.query.filter(Invoice.invoice_no.like(f"INV-{year}-%")) \
-                                    .order_by(Invoice.id.desc()).first()
-        if last_invoice:
-            try:
-                last_number = int(last_invoice.invoice_no.split('-')[-1])
-            except ValueError:
-                last_number = 0
-            new_number = last_number + 1
-        else:
-            new_number = 1
-        return f"INV-{year}-{new_number:03d}"
+        last_number = 0
+        # Check the archive too so numbers are never reused once a year's invoices are archived
+        for model in (Invoice, ArchivedInvoice):
+            last_invoice = model.query.filter(model.invoice_no.like(f"INV-{year}-%")) \
+                                      .order_by(model.id.desc()).first()
+            if last_invoice:
+                try:
+                    last_number = max(last_number, int(last_invoice.invoice_no.split('-')[-1]))
+                except ValueError:
+                    pass
+        return [f"INV-{year}-{n:03d}" for n in range(last_number + 1, last_number + 1 + count)]
+
+
+def status_for(paid, amount):
+    """Invoice status implied by the amount paid so far."""
+    if paid >= amount:
+        return 'paid'
+    if paid > 0:
+        return 'partial'
+    return 'pending'
+
+
+def installment_number_for(running_total, per_installment, max_installments):
+    """Installment a payment belongs to, given the running total paid up to and including it."""
+    number = int(ceil(running_total / per_installment))
+    if max_installments:
+        return int(max(1, min(max_installments, number)))
+    return number
 
 
 class Payment(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False, index=True)
     amount = db.Column(db.Float, nullable=False, default=0.0)
     method = db.Column(db.String(50))
     date = db.Column(db.Date, default=date.today)
@@ -128,6 +189,78 @@ class Payment(db.Model):
     installment_number = db.Column(db.Integer, nullable=True)
 
 
+class ArchivedInvoice(db.Model):
+    """Cold copy of a closed Invoice, moved out of the hot ledger by app.archive.
+
+    Rows keep their original id so archived payments still point at them.
+    """
+    __tablename__ = 'archived_invoice'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    invoice_no = db.Column(db.String(50), unique=True, nullable=False)
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False, index=True)
+    description = db.Column(db.String(250))
+    amount = db.Column(db.Float, nullable=False, default=0.0)
+    payment_type = db.Column(db.String(50), default='Full Payment')
+    paid = db.Column(db.Float, default=0.0)
+    due_date = db.Column(db.Date, nullable=True)
+    status = db.Column(db.String(50), default='paid')
+    installments = db.Column(db.Integer, default=1)
+    frequency = db.Column(db.String(20), default='monthly')
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payments = db.relationship('ArchivedPayment', backref='invoice', lazy=True)
+
+    @property
+    def installment_amount(self):
+        if self.installments and self.installments > 0:
+            return round(self.amount / self.installments, 2)
+        return 0.0
+
+    def remaining_balance(self):
+        return max(self.amount - (self.paid or 0), 0.0)
+
+    @property
+    def remaining_amount(self):
+        return self.remaining_balance()
+
+
+class ArchivedPayment(db.Model):
+    """Cold copy of a Payment that belonged to an archived invoice."""
+    __tablename__ = 'archived_payment'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('archived_invoice.id'), nullable=False, index=True)
+    amount = db.Column(db.Float, nullable=False, default=0.0)
+    method = db.Column(db.String(50))
+    date = db.Column(db.Date)
+    installment_number = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Job(db.Model):
+    """Deferred unit of work processed by the app.jobs workers."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, default='{}')  # JSON-encoded keyword arguments
+    dedupe_key = db.Column(db.String(200), index=True)
+    status = db.Column(db.String(20), default='pending', index=True)  # pending/running/done/failed
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=5)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Event(db.Model):
+    """Live-update event written by the write routes and fanned out by app.events."""
+    # Pruning can empty the table; ids must still grow so the pollers' last_id sees new rows
+    __table_args__ = {'sqlite_autoincrement': True}
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(50), nullable=False, index=True)  # 'owner' or 'client:<id>'
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, default='{}')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 # --- Event listener to auto-generate invoice_no before insert ---
 def set_invoice_no(mapper, connection, target):
     if not target.invoice_no:
@@ -0,0 +1,251 @@
+"""Overdue reminders and payment receipts sent over pooled SMTP connections.
+
+Recipients for reminders are selected with set-based queries over overdue
+invoices, paged ``MAIL_BATCH_SIZE`` clients at a time by client id, grouped
+into one message per client, rendered one page at a time and sent
+through a small pool of persistent SMTP connections with a bounded number of
+concurrent sends. Receipts are sent from the job queue, so payment requests
+never wait on SMTP.
+"""
+import queue
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from email.message import EmailMessage
+from itertools import groupby
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func
+
+from . import db
+from .jobs import enqueue, job_handler
+from .models import Client, Invoice, Payment
+
+notify_cli = AppGroup('notify', help='Send overdue reminders and receipts.')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class SMTPPool:
+    """Up to ``size`` persistent SMTP connections shared by concurrent senders."""
+
+    def __init__(self, host, port, size=4, use_tls=False, username=None, password=None, timeout=10):
+        self.host, self.port = host, port
+        self.use_tls, self.username, self.password = use_tls, username, password
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                conn.starttls()
+            if self.username:
+                conn.login(self.username, self.password)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def send(self, message):
+        """Send one EmailMessage, reusing an idle connection when there is one."""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                conn.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                # Idle connection was dropped by the server; retry once on a fresh one
+                conn.close()
+                conn = self._connect()
+                try:
+                    conn.send_message(message)
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                conn.quit()
+            except smtplib.SMTPException:
+                conn.close()
+
+
+def pool_from_config(config):
+    return SMTPPool(config['MAIL_SERVER'], config['MAIL_PORT'],
+                    size=config['MAIL_MAX_CONNECTIONS'],
+                    use_tls=config['MAIL_USE_TLS'],
+                    username=config['MAIL_USERNAME'],
+                    password=config['MAIL_PASSWORD'])
+
+
+def get_pool():
+    """Process-wide SMTP pool used by the receipt jobs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = pool_from_config(current_app.config)
+        return _pool
+
+
+def build_message(to, subject, body):
+    msg = EmailMessage()
+    msg['From'] = current_app.config['MAIL_SENDER']
+    msg['To'] = to
+    msg['Subject'] = subject
+    msg.set_content(body)
+    return msg
+
+
+# --- Overdue reminders ---
+
+def _overdue_filter(today):
+    return (Invoice.status != 'paid', Invoice.due_date < today,
+            Client.email.isnot(None), Client.email != '')
+
+
+def overdue_counts(today=None):
+    """(overdue invoices, clients to remind) without loading any rows."""
+    today = today or date.today()
+    return (db.session.query(func.count(Invoice.id), func.count(func.distinct(Client.id)))
+            .join(Invoice, Invoice.client_id == Client.id)
+            .filter(*_overdue_filter(today))
+            .one())
+
+
+def overdue_rows(today=None, after_client_id=0, clients=None):
+    """(Client, Invoice) pairs for unpaid invoices past due, ordered by client.
+
+    Only clients with an id above ``after_client_id`` are included, at most
+    ``clients`` of them when given, so callers can page through by client id.
+    """
+    today = today or date.today()
+    client_ids = (db.session.query(Client.id)
+                  .join(Invoice, Invoice.client_id == Client.id)
+                  .filter(Client.id > after_client_id, *_overdue_filter(today))
+                  .group_by(Client.id)
+                  .order_by(Client.id))
+    if clients is not None:
+        client_ids = client_ids.limit(clients)
+    return (db.session.query(Client, Invoice)
+            .join(Invoice, Invoice.client_id == Client.id)
+            .filter(Client.id.in_(client_ids.scalar_subquery()), *_overdue_filter(today))
+            .order_by(Client.id, Invoice.due_date)
+            .all())
+
+
+def overdue_pages(today=None, page_size=200):
+    """Yield [(client, [invoices...]), ...] for ``page_size`` clients at a time."""
+    after_client_id = 0
+    while True:
+        groups = group_by_client(overdue_rows(today, after_client_id, page_size))
+        if not groups:
+            return
+        yield groups
+        after_client_id = groups[-1][0].id
+
+
+def group_by_client(rows):
+    """[(client, [invoices...]), ...] from overdue_rows() output."""
+    return [(client, [inv for _, inv in pairs]) for client, pairs in groupby(rows, key=lambda row: row[0])]
+
+
+def render_reminders(groups, today=None):
+    """Render one reminder message per (client, invoices) group."""
+    today = today or date.today()
+    template = current_app.jinja_env.get_template('email/overdue_reminder.txt')
+    messages = []
+    for client, invoices in groups:
+        body = template.render(client=client, invoices=invoices, today=today,
+                               total_due=sum(inv.remaining_balance() for inv in invoices))
+        messages.append(build_message(client.email, 'Payment reminder: overdue invoices', body))
+    return messages
+
+
+def send_batch(pool, messages):
+    """Send messages concurrently through ``pool``. Returns (sent, failed)."""
+    sent = failed = 0
+    with ThreadPoolExecutor(max_workers=current_app.config['MAIL_MAX_CONNECTIONS']) as executor:
+        for future in [executor.submit(pool.send, msg) for msg in messages]:
+            try:
+                future.result()
+                sent += 1
+            except Exception:
+                failed += 1
+                current_app.logger.exception('Failed to send email')
+    return sent, failed
+
+
+def send_overdue_reminders(today=None, dry_run=False):
+    """Email every client with overdue invoices. Returns a dict of counts."""
+    result = {'invoices': 0, 'messages': 0, 'sent': 0, 'failed': 0}
+    if dry_run:
+        result['invoices'], result['messages'] = overdue_counts(today)
+        return result
+
+    # Load, render and send one page of clients at a time so memory stays flat for large runs
+    pool = pool_from_config(current_app.config)
+    try:
+        for groups in overdue_pages(today, current_app.config['MAIL_BATCH_SIZE']):
+            result['invoices'] += sum(len(invoices) for _, invoices in groups)
+            result['messages'] += len(groups)
+            messages = render_reminders(groups, today)
+            sent, failed = send_batch(pool, messages)
+            result['sent'] += sent
+            result['failed'] += failed
+    finally:
+        pool.close()
+    return result
+
+
+# --- Receipts ---
+
+@job_handler('send_payment_receipt')
+def send_payment_receipt(payment_id):
+    """Email a receipt for a recorded payment (runs in the job queue)."""
+    payment = db.session.get(Payment, payment_id)
+    if payment is None:
+        return  # deleted since the job was queued
+    invoice = payment.invoice
+    client = invoice.client
+    if not client or not client.email:
+        return
+    body = current_app.jinja_env.get_template('email/payment_receipt.txt').render(
+        client=client, invoice=invoice, payment=payment)
+    get_pool().send(build_message(client.email, f'Payment receipt for {invoice.invoice_no}', body))
+
+
+def enqueue_payment_receipt(payment):
+    """Queue a receipt for ``payment`` (flushes so the payment has an id). No-op when mail is off."""
+    if not current_app.config['MAIL_ENABLED']:
+        return None
+    db.session.flush()
+    return enqueue('send_payment_receipt', dedupe_key=f'send_payment_receipt:{payment.id}',
+                   payment_id=payment.id)
+
+
+# --- CLI ---
+
+@notify_cli.command('overdue')
+@click.option('--dry-run', is_flag=True, help='Only count recipients; send nothing.')
+def overdue_command(dry_run):
+    """Send overdue reminders to every affected client."""
+    result = send_overdue_reminders(dry_run=dry_run)
+    click.echo(f"{result['invoices']} overdue invoices, {result['messages']} messages, "
+               f"{result['sent']} sent, {result['failed']} failed.")
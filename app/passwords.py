@@ -0,0 +1,133 @@
+"""Password hashing with a configurable method and a host-wide verification limit.
+
+The hash method/cost comes from PASSWORD_HASH_METHOD (any Werkzeug method
+string, e.g. ``pbkdf2:sha256:600000`` or ``scrypt:32768:8:1``). Stored hashes
+made with another algorithm or a lower cost are upgraded on the next successful
+login, inside the same verification slot. Hashes with a higher cost are kept.
+
+A gunicorn sync worker is busy for as long as a hash takes, wherever the hash
+runs, so the limit has to hold across processes: a verification first takes
+one of LOGIN_HASH_SLOTS lock files in LOGIN_HASH_SLOT_DIR (``flock``, released
+by the kernel if the process dies). A login that gets no slot within
+LOGIN_HASH_QUEUE_TIMEOUT fails fast with LoginBusy, so a burst of logins can
+only ever hold LOGIN_HASH_SLOTS workers and the rest keep serving payments.
+Without ``fcntl`` (Windows dev server) the limit is per process.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+POLL_INTERVAL = 0.01
+
+_lock = threading.Lock()
+_local_slots = None
+
+
+class LoginBusy(Exception):
+    """Raised when no verification slot frees up within LOGIN_HASH_QUEUE_TIMEOUT."""
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
+
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    """Fully expanded parameter prefix Werkzeug writes for ``method`` (e.g. 'pbkdf2:sha256:600000')."""
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def _split_prefix(prefix):
+    """('pbkdf2:sha256:600000') -> (['pbkdf2', 'sha256'], [600000]): algorithm and cost parameters."""
+    parts = prefix.split(':')
+    costs = []
+    while parts and parts[-1].isdigit():
+        costs.insert(0, int(parts.pop()))
+    return parts, costs
+
+
+def needs_rehash(pwhash):
+    """True when ``pwhash`` uses another algorithm than configured, or a lower cost."""
+    algorithm, costs = _split_prefix(pwhash.split('$', 1)[0])
+    wanted_algorithm, wanted_costs = _split_prefix(_method_prefix(current_app.config['PASSWORD_HASH_METHOD']))
+    if algorithm != wanted_algorithm or len(costs) != len(wanted_costs):
+        return True
+    return any(cost < wanted for cost, wanted in zip(costs, wanted_costs))
+
+
+def _try_slot_files(folder, slots):
+    """Open file of the first free slot, locked, or None when all are taken."""
+    for i in range(slots):
+        f = open(os.path.join(folder, f'slot-{i}.lock'), 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            continue
+        return f
+    return None
+
+
+@contextmanager
+def verification_slot():
+    """Hold one of LOGIN_HASH_SLOTS host-wide slots, or raise LoginBusy."""
+    config = current_app.config
+    deadline = time.monotonic() + config['LOGIN_HASH_QUEUE_TIMEOUT']
+    if fcntl is None:
+        global _local_slots
+        with _lock:
+            if _local_slots is None:
+                _local_slots = threading.BoundedSemaphore(config['LOGIN_HASH_SLOTS'])
+        if not _local_slots.acquire(timeout=config['LOGIN_HASH_QUEUE_TIMEOUT']):
+            raise LoginBusy()
+        try:
+            yield
+        finally:
+            _local_slots.release()
+        return
+
+    folder = config['LOGIN_HASH_SLOT_DIR']
+    os.makedirs(folder, exist_ok=True)
+    while True:
+        slot = _try_slot_files(folder, config['LOGIN_HASH_SLOTS'])
+        if slot is not None:
+            break
+        if time.monotonic() >= deadline:
+            raise LoginBusy()
+        time.sleep(POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        # Closing the file releases the lock
+        slot.close()
+
+
+def verify_password(pwhash, password):
+    """Check ``password`` against ``pwhash`` while holding a verification slot.
+
+    Raises LoginBusy if every slot stays taken for LOGIN_HASH_QUEUE_TIMEOUT seconds.
+    """
+    with verification_slot():
+        return check_password_hash(pwhash, password)
+
+
+def verify_and_upgrade(pwhash, password):
+    """Like verify_password, but returns ``(valid, new_hash)``.
+
+    ``new_hash`` is a fresh hash with the configured method when the password is
+    valid and ``pwhash`` needs a rehash, else None. Both hashes run in one slot.
+    """
+    with verification_slot():
+        if not check_password_hash(pwhash, password):
+            return False, None
+        return True, hash_password(password) if needs_rehash(pwhash) else None
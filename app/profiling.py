@@ -0,0 +1,150 @@
+"""On-demand sampling profiler for single production requests.
+
+An owner adds ``?_profile=<token>`` (or the ``X-Profile-Token`` header) to any
+URL, using a signed token from ``/admin/profiles``. That one request is then
+sampled: a helper thread reads the request thread's stack every
+``PROFILE_INTERVAL`` seconds via ``sys._current_frames()`` until the response,
+including a streamed body, has finished. The samples are written to
+``PROFILE_DIR`` as collapsed stacks (``.folded``), which flamegraph.pl,
+speedscope and inferno read directly.
+
+Requests without the flag pay only for one header and one query-string lookup.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app, g, request
+from flask_login import current_user
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+QUERY_FLAG = '_profile'
+HEADER = 'X-Profile-Token'
+SALT = 'ais-profile'
+
+
+class Sampler:
+    """Collects collapsed stacks of one thread until stopped."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def collapse(frame):
+    """'outer;...;inner' stack string for ``frame``, in flamegraph's folded format."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name}@{os.path.basename(code.co_filename)}:{code.co_firstlineno}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+# --- Tokens ---
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=SALT)
+
+
+def make_token(user):
+    return _serializer().dumps({'uid': user.id})
+
+
+def token_valid(token):
+    """True when ``token`` was issued to the logged-in owner and has not expired."""
+    try:
+        data = _serializer().loads(token, max_age=current_app.config['PROFILE_TOKEN_MAX_AGE'])
+    except BadSignature:
+        return False
+    return (current_user.is_authenticated and current_user.role == 'owner'
+            and data.get('uid') == current_user.id)
+
+
+# --- Stored profiles ---
+
+def profile_dir(app):
+    return app.config['PROFILE_DIR']
+
+
+def save_profile(app, endpoint, sampler):
+    """Write the samples to PROFILE_DIR and keep only the newest PROFILE_KEEP files."""
+    folder = profile_dir(app)
+    stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')
+    name = f"{stamp}_{re.sub(r'[^A-Za-z0-9_.-]', '-', endpoint)}_{int(sampler.duration * 1000)}ms.folded"
+    with open(os.path.join(folder, name), 'w') as f:
+        f.write(sampler.folded())
+    for old in list_profiles(app)[app.config['PROFILE_KEEP']:]:
+        os.remove(os.path.join(folder, old['name']))
+    return name
+
+
+def list_profiles(app):
+    """Stored profiles, newest first, with the metadata encoded in their names."""
+    folder = profile_dir(app)
+    profiles = []
+    for name in os.listdir(folder):
+        match = re.fullmatch(r'(\d{8}-\d{6})-\d+_(.+)_(\d+)ms\.folded', name)
+        if not match:
+            continue
+        path = os.path.join(folder, name)
+        with open(path) as f:
+            samples = sum(int(line.rsplit(' ', 1)[1]) for line in f if line.strip())
+        profiles.append({
+            'name': name,
+            'created': datetime.strptime(match.group(1), '%Y%m%d-%H%M%S'),
+            'endpoint': match.group(2),
+            'duration_ms': int(match.group(3)),
+            'samples': samples,
+            'size': os.path.getsize(path),
+        })
+    profiles.sort(key=lambda p: p['name'], reverse=True)
+    return profiles
+
+
+# --- Wiring ---
+
+def init_app(app):
+    os.makedirs(profile_dir(app), exist_ok=True)
+
+    @app.before_request
+    def _maybe_start_profile():
+        token = request.headers.get(HEADER) or request.args.get(QUERY_FLAG)
+        if not token or not token_valid(token):
+            return
+        g.profiler = Sampler(threading.get_ident(), app.config['PROFILE_INTERVAL'])
+        g.profiler.start()
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        sampler = g.pop('profiler', None)
+        if sampler is None:
+            return
+        sampler.stop()
+        name = save_profile(app, request.endpoint or 'none', sampler)
+        app.logger.info('Saved profile %s (%d samples)', name, sum(sampler.stacks.values()))
@@ -0,0 +1,42 @@
+from flask import Blueprint, render_template, current_app, send_from_directory, abort, url_for
+from flask_login import login_required, current_user
+from .models import Job
+from .utils import owner_required
+from .routing import read_only
+from .jobs import status_counts
+from .profiling import QUERY_FLAG, HEADER, list_profiles, make_token, profile_dir
+
+admin_bp = Blueprint('admin', __name__)
+
+
+@admin_bp.route('/admin/jobs')
+@login_required
+@owner_required
+@read_only
+def jobs_status():
+    """Background job queue status (Owner only)"""
+    counts = status_counts()
+    recent_jobs = Job.query.order_by(Job.id.desc()).limit(50).all()
+    failed_jobs = Job.query.filter_by(status='failed').order_by(Job.updated_at.desc()).limit(20).all()
+    return render_template('admin_jobs.html', counts=counts, recent_jobs=recent_jobs, failed_jobs=failed_jobs)
+
+
+@admin_bp.route('/admin/profiles')
+@login_required
+@owner_required
+def profiles():
+    """Recent request profiles and a fresh profiling token (Owner only)"""
+    token = make_token(current_user)
+    return render_template('admin_profiles.html', profiles=list_profiles(current_app),
+                           token=token, query_flag=QUERY_FLAG, header=HEADER,
+                           example_url=url_for('clients.clients_list', **{QUERY_FLAG: token}),
+                           max_age=current_app.config['PROFILE_TOKEN_MAX_AGE'])
+
+
+@admin_bp.route('/admin/profiles/<name>')
+@login_required
+@owner_required
+def download_profile(name):
+    if not any(p['name'] == name for p in list_profiles(current_app)):
+        abort(404)
+    return send_from_directory(profile_dir(current_app), name, as_attachment=True, mimetype='text/plain')
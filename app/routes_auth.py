@@ -2,7 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from .models import User, Client
 from . import db, login_manager
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from .passwords import LoginBusy
 from .utils import owner_required
 
 auth_bp = Blueprint('auth', __name__)
@@ -17,8 +17,14 @@ def login():
         password = request.form.get('password')
 
         user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
+        try:
+            valid = bool(user and user.check_password(password))
+        except LoginBusy:
+            flash('The server is busy, please try again in a moment.', 'warning')
+            return render_template('login.html'), 503
+        if valid:
             login_user(user)
+            db.session.commit()  # persists a rehashed password, if any
             flash('Logged in successfully.', 'success')
             return redirect(url_for('dashboard.dashboard'))
         flash('Invalid username or password.', 'danger')
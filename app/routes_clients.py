@@ -1,8 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify
+from flask import Blueprint, request, redirect, url_for, flash, abort, jsonify
 from flask_login import login_required, current_user
 from .models import Client, Invoice, Payment # <-- Ensure all models are imported
 from . import db
-from .utils import owner_required
+from .utils import owner_required, stream_page
+from .routing import read_only
+from .archive import archived_totals, archived_totals_by_client, client_invoices, client_payments, include_archived_requested
+from .deletion import delete_client_data
+from .statements import statement_response
 from datetime import datetime
 from decimal import Decimal # Import Decimal for safe rounding if needed, although float is used below
 
@@ -58,6 +62,7 @@ def serialize_payment(pay):
 
 @clients_bp.route('/clients')
 @login_required
+@read_only
 def clients_list():
     """
     Owner: view all clients
@@ -69,17 +74,25 @@ def clients_list():
     else:
         clients = Client.query.filter_by(email=current_user.username).all()
 
-    # Compute totals for each client for the dashboard/modal
+    # Compute totals for each client for the dashboard/modal (hot + archived invoices),
+    # one grouped query per table instead of loading every client's invoices
+    hot = {cid: (invoiced or 0.0, paid or 0.0) for cid, invoiced, paid in
+           db.session.query(Invoice.client_id, db.func.sum(Invoice.amount), db.func.sum(Invoice.paid))
+           .group_by(Invoice.client_id)}
+    archived = archived_totals_by_client()
     for c in clients:
-        c.total_invoiced = sum((inv.amount or 0) for inv in c.invoices)
-        c.total_paid = sum((inv.paid or 0) for inv in c.invoices)
+        hot_invoiced, hot_paid = hot.get(c.id, (0.0, 0.0))
+        archived_invoiced, archived_paid = archived.get(c.id, (0.0, 0.0))
+        c.total_invoiced = hot_invoiced + archived_invoiced
+        c.total_paid = hot_paid + archived_paid
 
-    return render_template('clients.html', clients=clients)
+    return stream_page('clients.html', clients=clients)
 
 
 @clients_bp.route('/clients/json')
 @login_required
 @owner_required
+@read_only
 def clients_json():
     """Returns a list of all clients as JSON for the owner's 'Switch Client' modal."""
     clients = Client.query.all()
@@ -144,48 +157,56 @@ def edit_client(id):
 @login_required
 @owner_required
 def delete_client(id):
-    """Delete client (Owner only)"""
+    """Delete client with all invoices and payments (Owner only).
+
+    ?dry_run=1 only returns the row counts that would be deleted, as JSON.
+    """
     client = Client.query.get_or_404(id)
-    
-    # In a real application, you would need to handle (delete or reassign) 
-    # all associated Invoices and Payments before deleting the client.
-    
-    db.session.delete(client)
-    db.session.commit()
+
+    if request.args.get('dry_run', '').lower() in ('1', 'true', 'yes'):
+        return jsonify(delete_client_data(client.id, dry_run=True))
+
+    delete_client_data(client.id)
     flash('Client deleted.', 'danger')
     return redirect(url_for('clients.clients_list'))
 
 
 # routes_clients.py
 
-@clients_bp.route('/client/<int:id>/details')
-@login_required
-def client_details(id):
-    """Fetch client details, ALL invoices, and ALL payments (for modal view)"""
+def get_visible_client(id):
+    """Load a client, aborting with 403 if a client user asks for someone else's record."""
     client = Client.query.get_or_404(id)
-    
+
     # SECURITY CHECK: A client user should only be able to view their OWN details
     if current_user.role == 'client':
         effective_client = Client.query.filter_by(email=current_user.username).first()
         if not effective_client or effective_client.id != client.id:
             abort(403)
-            
+    return client
+
+
+@clients_bp.route('/client/<int:id>/details')
+@login_required
+@read_only
+def client_details(id):
+    """Fetch client details, ALL invoices, and ALL payments (for modal view).
+
+    Pass ?include_archived=1 to also list archived invoices/payments; totals always cover both.
+    """
+    client = get_visible_client(id)
+
     # Fetch ALL data needed for the detailed profile modal
     # Use Invoice.id.desc() for consistent sorting when date is the same
-    # ******************************************************************************************
-    # FIX: Change Invoice.date to Invoice.due_date
-    all_invoices = Invoice.query.filter_by(client_id=id).order_by(Invoice.due_date.desc(), Invoice.id.desc()).all()
-    # ******************************************************************************************
-    
-    # Fetch ALL payments associated with this client's invoices
-    all_payments = Payment.query.join(Invoice).filter(
-        Invoice.client_id == client.id
-    ).order_by(Payment.date.desc()).all()
+    include_archived = include_archived_requested(request.args)
+    all_invoices = client_invoices(client.id, include_archived)
 
+    # Fetch ALL payments associated with this client's invoices
+    all_payments = client_payments(client.id, include_archived)
 
-    total_invoiced = sum((inv.amount or 0) for inv in all_invoices)
-    # ... rest of the function ...
-    total_paid = sum((inv.paid or 0) for inv in all_invoices)
+    hot_invoices = [inv for inv in all_invoices if isinstance(inv, Invoice)]
+    archived_invoiced, archived_paid = archived_totals(client.id)
+    total_invoiced = sum((inv.amount or 0) for inv in hot_invoices) + archived_invoiced
+    total_paid = sum((inv.paid or 0) for inv in hot_invoices) + archived_paid
     outstanding = total_invoiced - total_paid
 
     # Return data as JSON response
@@ -206,3 +227,24 @@ def client_details(id):
         "all_invoices": [serialize_invoice(inv) for inv in all_invoices],
         "all_payments": [serialize_payment(pay) for pay in all_payments]
     })
+
+
+@clients_bp.route('/client/<int:id>/statement')
+@login_required
+@read_only
+def client_statement(id):
+    """Streamed statement with running balance as JSON.
+
+    Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD range and ?include_archived=1.
+    """
+    client = get_visible_client(id)
+    return statement_response(client, request.args)
+
+
+@clients_bp.route('/client/<int:id>/statement.csv')
+@login_required
+@read_only
+def client_statement_csv(id):
+    """Streamed statement export as CSV (same parameters as client_statement)."""
+    client = get_visible_client(id)
+    return statement_response(client, request.args, fmt='csv')
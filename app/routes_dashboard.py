@@ -1,22 +1,29 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, abort, jsonify, current_app
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from datetime import date, timedelta
 from .models import Invoice, Payment, Client
-from .utils import calculate_totals
+from .utils import calculate_totals, payment_stats, owner_required
+from .routing import read_only
+from .archive import archived_totals
+from .events import last_event_id, sse_response
+from .forecast import forecast_from_args
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 @dashboard_bp.route('/')
 @dashboard_bp.route('/dashboard')
 @login_required
+@read_only
 def dashboard():
+    client_rec = None
     if current_user.role == 'owner':
-        invoices = Invoice.query.all()
+        invoices = Invoice.query.options(joinedload(Invoice.client)).all()
         payments = Payment.query.order_by(Payment.date.desc()).all()
         clients = Client.query.all()
     else:
         client_rec = Client.query.filter_by(email=current_user.username).first()
-        invoices = Invoice.query.filter_by(client_id=client_rec.id).all() if client_rec else []
+        invoices = Invoice.query.options(joinedload(Invoice.client)).filter_by(client_id=client_rec.id).all() if client_rec else []
         payments = Payment.query.join(Invoice).filter(
             Invoice.client_id == (client_rec.id if client_rec else None)
         ).all()
@@ -25,6 +32,12 @@ def dashboard():
     # Totals
     total_revenue, total_paid, outstanding = calculate_totals(invoices)
 
+    # Archived invoices are fully paid: they count towards revenue and paid, never outstanding
+    if current_user.role == 'owner' or client_rec:
+        archived_revenue, archived_paid = archived_totals(client_rec.id if client_rec else None)
+        total_revenue += archived_revenue
+        total_paid += archived_paid
+
     # Overdue invoices
     overdue_invoices = [
         inv for inv in invoices
@@ -34,10 +47,13 @@ def dashboard():
     # Installment invoices
     installment_invoices = [inv for inv in invoices if inv.payment_type and inv.payment_type.lower().startswith('install')]
 
-    # ✅ Pre-compute progress_percent for each installment invoice
+    # ✅ Pre-compute progress_percent for each installment invoice (payment sums in one grouped query)
+    stats = payment_stats(None if current_user.role == 'owner' else (client_rec.id if client_rec else -1))
     for inv in installment_invoices:
+        inv_paid, inv_explicit = stats.get(inv.id, (0.0, 0))
+        inv.installments_display_count = inv.installments_display_from(inv_explicit, inv_paid)
         if inv.installments and inv.installments > 0:
-            inv.progress_percent = (inv.installments_paid() / inv.installments) * 100
+            inv.progress_percent = (inv.installments_paid_from(inv_explicit, inv_paid) / inv.installments) * 100
         else:
             inv.progress_percent = 0
 
@@ -56,3 +72,31 @@ def dashboard():
         installment_invoices=installment_invoices,
         recent_payments=recent_payments
     )
+
+
+@dashboard_bp.route('/dashboard/events')
+@login_required
+def dashboard_events():
+    """Live totals and recent payments for the dashboard (owner: everything; client: own data)."""
+    if not current_app.config['EVENTS_ENABLED']:
+        abort(404)
+    if current_user.role == 'owner':
+        channels = ['owner']
+    else:
+        client_rec = Client.query.filter_by(email=current_user.username).first()
+        if not client_rec:
+            abort(403)
+        channels = [f'client:{client_rec.id}']
+    return sse_response(channels, last_event_id(request))
+
+
+@dashboard_bp.route('/dashboard/forecast.json')
+@login_required
+@owner_required
+@read_only
+def forecast_json():
+    """Projected collections per month (?horizon=&late_rate=&late_days=&default_rate=)."""
+    try:
+        return jsonify(forecast_from_args(request.args))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
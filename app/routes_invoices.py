@@ -1,33 +1,42 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+from flask import Blueprint, request, redirect, url_for, flash, abort, jsonify
+from sqlalchemy.orm import joinedload
 from flask_login import login_required, current_user
-from .models import Invoice, Client
+from .models import Invoice, Client, Payment
 from . import db
-from .utils import owner_required
+from .utils import owner_required, stream_page
+from .routing import read_only
+from .deletion import delete_invoices
+from .events import publish_invoice
+from .jobs import enqueue_invoice_refresh
+from . import bulk
 from datetime import datetime
+import math
 
 invoices_bp = Blueprint('invoices', __name__)
 
 @invoices_bp.route('/invoices')
 @login_required
+@read_only
 def invoices_list():
     if current_user.role == 'owner':
-        invoices = Invoice.query.all()
+        invoices = Invoice.query.options(joinedload(Invoice.client)).all()
         clients = Client.query.all()
     else:
         client_rec = Client.query.filter_by(email=current_user.username).first()
-        invoices = Invoice.query.filter_by(client_id=client_rec.id).all() if client_rec else []
+        invoices = Invoice.query.options(joinedload(Invoice.client)).filter_by(client_id=client_rec.id).all() if client_rec else []
         clients = []
-    return render_template('invoices.html', invoices=invoices, clients=clients)
+    return stream_page('invoices.html', invoices=invoices, clients=clients)
 
-@invoices_bp.route('/invoices/add', methods=['POST'])
-@login_required
-@owner_required
-def add_invoice():
-    invoice_no = request.form.get('invoice_no')
-    client_id = int(request.form.get('client_id'))
-    description = request.form.get('description')
-    amount = float(request.form.get('amount') or 0)
-    payment_type = request.form.get('payment_type')
+def invoice_template(form):
+    """Invoice column values (everything but number and client) from the create-invoice form."""
+    description = form.get('description')
+    try:
+        amount = float(form.get('amount') or 0)
+    except (TypeError, ValueError):
+        abort(400)
+    if not math.isfinite(amount):
+        abort(400)
+    payment_type = form.get('payment_type')
     # Normalize incoming values from the form (radio values can be 'full'/'installment')
     if payment_type:
         pt = payment_type.strip().lower()
@@ -43,19 +52,29 @@ def add_invoice():
     frequency = 'monthly'
     if payment_type == 'Installment':
         try:
-            installments = int(request.form.get('installments') or 1)
+            installments = int(form.get('installments') or 1)
         except Exception:
             installments = 1
-        frequency = request.form.get('frequency') or 'monthly'
-    due_date = request.form.get('due_date')
-    due_date_obj = datetime.strptime(due_date, '%Y-%m-%d').date() if due_date else None
-
-    inv = Invoice(
-        invoice_no=invoice_no, client_id=client_id, description=description,
-        amount=amount, payment_type=payment_type, due_date=due_date_obj,
-        status='pending', installments=installments, frequency=frequency
-    )
+        frequency = form.get('frequency') or 'monthly'
+    due_date = form.get('due_date')
+    try:
+        due_date_obj = datetime.strptime(due_date, '%Y-%m-%d').date() if due_date else None
+    except (TypeError, ValueError):
+        abort(400)
+
+    return dict(description=description, amount=amount, payment_type=payment_type,
+                due_date=due_date_obj, installments=installments, frequency=frequency)
+
+@invoices_bp.route('/invoices/add', methods=['POST'])
+@login_required
+@owner_required
+def add_invoice():
+    invoice_no = request.form.get('invoice_no') or Invoice.generate_invoice_no()
+    client_id = int(request.form.get('client_id'))
+    inv = Invoice(invoice_no=invoice_no, client_id=client_id, status='pending',
+                  **invoice_template(request.form))
     db.session.add(inv)
+    publish_invoice(inv, 'invoice_created')
     db.session.commit()
     flash('Invoice created.', 'success')
     return redirect(url_for('invoices.invoices_list'))
@@ -65,8 +84,8 @@ def add_invoice():
 @owner_required
 def delete_invoice(id):
     inv = Invoice.query.get_or_404(id)
-    db.session.delete(inv)
-    db.session.commit()
+    publish_invoice(inv, 'invoice_deleted')  # committed together with the delete
+    delete_invoices([inv.id])
     flash('Invoice deleted.', 'danger')
     return redirect(url_for('invoices.invoices_list'))
 
@@ -75,8 +94,84 @@ def delete_invoice(id):
 @owner_required
 def mark_invoice_paid(id):
     inv = Invoice.query.get_or_404(id)
-    inv.paid = inv.amount
+    # Overpaid invoices keep their paid amount; only an open balance is settled
+    paid_delta = max((inv.amount or 0) - (inv.paid or 0), 0.0)
+    if paid_delta > 0:
+        # Record the balance as a payment so Invoice.paid keeps matching the payment rows
+        db.session.add(Payment(invoice_id=inv.id, amount=paid_delta, method='Marked paid',
+                               date=datetime.utcnow().date()))
+        enqueue_invoice_refresh(inv.id)
+        inv.paid = inv.amount
     inv.status = 'paid'
+    publish_invoice(inv, 'invoice_paid', paid_delta)
     db.session.commit()
     flash('Invoice marked as paid.', 'success')
-    return redirect(url_for('invoices.invoices_list'))
\ No newline at end of file
+    return redirect(url_for('invoices.invoices_list'))
+
+class _JSONForm(dict):
+    """A JSON body with the getlist() interface of request.form."""
+
+    def getlist(self, key):
+        return self.get(key) or []
+
+def _request_data():
+    data = request.get_json(silent=True)
+    return request.form if data is None else _JSONForm(data)
+
+def _int_list(data, key):
+    try:
+        return [int(i) for i in data.getlist(key)]
+    except (TypeError, ValueError):
+        abort(400)
+
+def _bulk_response(summary, message, category='success'):
+    """JSON summary for API callers, otherwise one flash message and a redirect to the list."""
+    if request.is_json:
+        return jsonify(summary)
+    flash(message, category)
+    return redirect(url_for('invoices.invoices_list'))
+
+@invoices_bp.route('/invoices/bulk', methods=['POST'])
+@login_required
+@owner_required
+def bulk_action():
+    """Mark paid, delete or change the due date of the selected invoices in one transaction."""
+    data = _request_data()
+    action = data.get('action')
+    ids = _int_list(data, 'invoice_ids')
+    if action not in bulk.ACTIONS:
+        abort(400)
+    if not ids:
+        return _bulk_response({'action': action, 'invoices': 0}, 'No invoices selected.', 'warning')
+
+    if action == 'mark_paid':
+        summary = bulk.mark_paid(ids)
+        message = f"Marked {summary['invoices']} invoices as paid (₱{summary['amount']:.2f} recorded)."
+    elif action == 'delete':
+        summary = bulk.delete(ids)
+        message = f"Deleted {summary['invoices']} invoices and {summary['payments']} payments."
+    else:
+        try:
+            due_date = datetime.strptime(data.get('due_date') or '', '%Y-%m-%d').date()
+        except ValueError:
+            abort(400)
+        summary = bulk.change_due_date(ids, due_date)
+        message = f"Moved {summary['invoices']} invoices to {due_date.strftime('%m/%d/%Y')}."
+    return _bulk_response(summary, message)
+
+@invoices_bp.route('/invoices/bulk/create', methods=['POST'])
+@login_required
+@owner_required
+def bulk_create():
+    """Create the same invoice for every selected client (or all clients)."""
+    data = _request_data()
+    # Explicit opt-in: '0', 'false' or an empty value must not select every client
+    if str(data.get('all_clients', '')).lower() in ('1', 'true', 'yes'):
+        client_ids = [row[0] for row in db.session.query(Client.id)]
+    else:
+        client_ids = _int_list(data, 'client_ids')
+    summary = bulk.create_invoices(client_ids, invoice_template(data))
+    if not summary['invoices']:
+        return _bulk_response(summary, 'No clients selected.', 'warning')
+    return _bulk_response(summary, f"Created {summary['invoices']} invoices "
+                                   f"({summary['first_invoice_no']} to {summary['last_invoice_no']}).")
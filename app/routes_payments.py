@@ -1,24 +1,34 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+from flask import Blueprint, request, redirect, url_for, flash, abort
+from sqlalchemy.orm import joinedload
 from flask_login import login_required, current_user
 from .models import Payment, Invoice, Client
 from . import db
-from .utils import owner_required
+from .utils import owner_required, payment_stats, stream_page
+from .routing import read_only
+from .jobs import enqueue_invoice_refresh
+from .notifications import enqueue_payment_receipt
+from .events import publish_payment
 from datetime import datetime
 
 payments_bp = Blueprint('payments', __name__)
 
 @payments_bp.route('/payments')
 @login_required
+@read_only
 def payments_list():
+    with_invoice = joinedload(Payment.invoice).joinedload(Invoice.client)
     if current_user.role == 'owner':
-        payments = Payment.query.order_by(Payment.date.desc()).all()
-        invoices = Invoice.query.all()
+        payments = Payment.query.options(with_invoice).order_by(Payment.date.desc()).all()
+        invoices = Invoice.query.options(joinedload(Invoice.client)).all()
+        stats = payment_stats()
     else:
         client_rec = Client.query.filter_by(email=current_user.username).first()
         # payments for this client's invoices
-        payments = Payment.query.join(Invoice).filter(Invoice.client_id == (client_rec.id if client_rec else None)).order_by(Payment.date.desc()).all()
+        payments = Payment.query.options(with_invoice).join(Invoice).filter(Invoice.client_id == (client_rec.id if client_rec else None)).order_by(Payment.date.desc()).all()
         invoices = []
-    return render_template('payments.html', payments=payments, invoices=invoices, now=datetime.utcnow().date())
+        stats = {}
+    return stream_page('payments.html', payments=payments, invoices=invoices, payment_stats=stats,
+                       now=datetime.utcnow().date())
 
 @payments_bp.route('/payments/add', methods=['POST'])
 @login_required
@@ -36,33 +46,12 @@ def add_payment():
 
     # Update invoice paid amount
     invoice.paid = (invoice.paid or 0) + amount
+    invoice.refresh_status()
 
-    # If the invoice is an installment plan, compute per-installment amount and
-    # backfill installment numbers for all payments in chronological order.
-    if invoice.payment_type and invoice.payment_type.lower().startswith('install'):
-        try:
-            per_inst = float(invoice.installment_amount or 0)
-        except Exception:
-            per_inst = 0.0
-
-        if per_inst > 0:
-            # Retrieve payments ordered by date then id to have stable ordering
-            payments = Payment.query.filter_by(invoice_id=invoice.id).order_by(Payment.date, Payment.id).all()
-            running = 0.0
-            try:
-                from math import ceil
-                max_inst = int(invoice.installments or 0)
-            except Exception:
-                max_inst = 0
-
-            for p in payments:
-                running += (p.amount or 0)
-                inst_num = int(max(1, min(max_inst, int(ceil(running / per_inst))))) if max_inst else int(ceil(running / per_inst))
-                p.installment_number = inst_num
-    if invoice.paid >= invoice.amount:
-        invoice.status = 'paid'
-    else:
-        invoice.status = 'partial'
+    # Installment renumbering (and anything else that follows a payment) runs in the job queue
+    enqueue_invoice_refresh(invoice.id)
+    enqueue_payment_receipt(payment)
+    publish_payment(payment, invoice)
 
     db.session.commit()
     flash('Payment recorded.', 'success')
@@ -75,11 +64,10 @@ def delete_payment(id):
     pay = Payment.query.get_or_404(id)
     invoice = pay.invoice
     invoice.paid = max((invoice.paid or 0) - (pay.amount or 0), 0)
-    if invoice.paid <= 0:
-        invoice.status = 'pending'
-    elif invoice.paid < invoice.amount:
-        invoice.status = 'partial'
+    invoice.refresh_status()
+    publish_payment(pay, invoice, removed=True)
     db.session.delete(pay)
+    enqueue_invoice_refresh(invoice.id)
     db.session.commit()
     flash('Payment deleted.', 'danger')
     return redirect(url_for('payments.payments_list'))
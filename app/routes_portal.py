@@ -3,6 +3,12 @@ from flask_login import login_required, current_user
 from .models import Client, Invoice, Payment
 from . import db
 from .utils import owner_required
+from .routing import read_only
+from .jobs import enqueue_invoice_refresh
+from .notifications import enqueue_payment_receipt
+from .events import publish_payment
+from .statements import statement_response
+from .archive import client_invoices, client_payments, include_archived_requested
 from datetime import datetime
 
 portal_bp = Blueprint('portal', __name__)
@@ -23,6 +29,7 @@ def get_effective_client():
 
 @portal_bp.route('/portal')
 @login_required
+@read_only
 def portal_dashboard():
     client = get_effective_client()
     if not client:
@@ -35,16 +42,18 @@ def portal_dashboard():
 
 @portal_bp.route('/portal/invoices')
 @login_required
+@read_only
 def portal_invoices():
     client = get_effective_client()
     if not client:
         abort(403)
-    invoices = Invoice.query.filter_by(client_id=client.id).all()
+    invoices = client_invoices(client.id, include_archived_requested(request.args))
     return render_template('portal/invoices.html', client=client, invoices=invoices)
 
 
 @portal_bp.route('/portal/invoices/<int:id>')
 @login_required
+@read_only
 def portal_invoice_detail(id):
     client = get_effective_client()
     if not client:
@@ -77,31 +86,12 @@ def portal_add_payment():
     db.session.add(payment)
 
     invoice.paid = (invoice.paid or 0) + amount
-    if invoice.paid >= invoice.amount:
-        invoice.status = 'paid'
-    else:
-        invoice.status = 'partial'
-
-    # backfill installment numbers if installment plan
-    if invoice.payment_type and invoice.payment_type.lower().startswith('install'):
-        try:
-            per_inst = float(invoice.installment_amount or 0)
-        except Exception:
-            per_inst = 0.0
-
-        if per_inst > 0:
-            payments = Payment.query.filter_by(invoice_id=invoice.id).order_by(Payment.date, Payment.id).all()
-            running = 0.0
-            try:
-                from math import ceil
-                max_inst = int(invoice.installments or 0)
-            except Exception:
-                max_inst = 0
-
-            for p in payments:
-                running += (p.amount or 0)
-                inst_num = int(max(1, min(max_inst, int(ceil(running / per_inst))))) if max_inst else int(ceil(running / per_inst))
-                p.installment_number = inst_num
+    invoice.refresh_status()
+
+    # backfill installment numbers in the job queue
+    enqueue_invoice_refresh(invoice.id)
+    enqueue_payment_receipt(payment)
+    publish_payment(payment, invoice)
 
     db.session.commit()
     flash('Payment recorded.', 'success')
@@ -110,9 +100,31 @@ def portal_add_payment():
 
 @portal_bp.route('/portal/payments')
 @login_required
+@read_only
 def portal_payments():
     client = get_effective_client()
     if not client:
         abort(403)
-    payments = Payment.query.join(Invoice).filter(Invoice.client_id == client.id).order_by(Payment.date.desc()).all()
-    return render_template('portal/payments.html', client=client, payments=payments)
\ No newline at end of file
+    payments = client_payments(client.id, include_archived_requested(request.args))
+    return render_template('portal/payments.html', client=client, payments=payments)
+
+
+@portal_bp.route('/portal/statement')
+@login_required
+@read_only
+def portal_statement():
+    client = get_effective_client()
+    if not client:
+        abort(403)
+    return statement_response(client, request.args)
+
+
+@portal_bp.route('/portal/statement.csv')
+@login_required
+@read_only
+def portal_statement_csv():
+    client = get_effective_client()
+    if not client:
+        abort(403)
+    return statement_response(client, request.args, fmt='csv')
+
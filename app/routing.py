@@ -0,0 +1,85 @@
+"""Read/write routing between the primary database and a read-only engine.
+
+Views decorated with ``@read_only`` (dashboards, lists, details, portal pages,
+statements) run their SELECTs on the ``'replica'`` bind: a read-only SQLite
+connection (``mode=ro``) over the WAL-mode primary file by default, or a
+replica server when ``AIS_REPLICA_DATABASE_URL`` is set. Everything else, and
+any flush or DML statement even inside a read-only view, uses the primary.
+
+Read-your-writes: after a successful POST the user's session is pinned to the
+primary for ``DB_READ_YOUR_WRITES_SECONDS``, so the redirect that follows
+never reads from a replica that has not caught up yet.
+"""
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def read_only(f):
+    """Mark a view as safe to serve from the read-only engine."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        return f(*args, **kwargs)
+    decorated_function.read_only = True
+    return decorated_function
+
+
+def use_replica():
+    return has_request_context() and g.get('db_read_only', False)
+
+
+class RoutingSession(Session):
+    """Session that sends reads from read-only views to the replica bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and use_replica() \
+                and not getattr(clause, 'is_dml', False):
+            engine = self._db.engines.get(REPLICA)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _sqlite_pragmas(*pragmas):
+    def on_connect(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return on_connect
+
+
+def init_app(app, db):
+    """Configure the engines and the per-request routing decision."""
+    with app.app_context():
+        primary = db.engines[None]
+        replica = db.engines.get(REPLICA)
+    if primary.dialect.name == 'sqlite':
+        # WAL lets the read-only connections read while a payment is being written
+        event.listen(primary, 'connect', _sqlite_pragmas('PRAGMA journal_mode=WAL',
+                                                         'PRAGMA busy_timeout=5000'))
+    if replica is not None and replica.dialect.name == 'sqlite':
+        event.listen(replica, 'connect', _sqlite_pragmas('PRAGMA query_only=1',
+                                                         'PRAGMA busy_timeout=5000'))
+
+    @app.before_request
+    def _choose_engine():
+        view = app.view_functions.get(request.endpoint)
+        g.db_read_only = (
+            app.config['DB_READ_ROUTING']
+            and request.method in SAFE_METHODS
+            and getattr(view, 'read_only', False)
+            and session.get('_db_primary_until', 0) < time.time()
+        )
+
+    @app.after_request
+    def _pin_after_write(response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            session['_db_primary_until'] = time.time() + app.config['DB_READ_YOUR_WRITES_SECONDS']
+        return response
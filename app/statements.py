@@ -0,0 +1,194 @@
+"""Client statements: a chronological ledger of invoices and payments.
+
+Invoices are debits (posted on their due date) and payments are credits.
+The running balance comes from a ``SUM() OVER (ORDER BY ...)`` window in the
+database, and rows are streamed with ``yield_per`` so very long histories
+never have to be held in memory. Archived rows are included on request.
+
+Free-text CSV cells that a spreadsheet would read as a formula are prefixed
+with ``'`` (see ``csv_safe``).
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from flask import Response, abort, stream_with_context
+from sqlalchemy import and_, func, literal, or_, select, union_all
+
+from . import db
+from .archive import include_archived_requested
+from .models import ArchivedInvoice, ArchivedPayment, Invoice, Payment
+
+STREAM_CHUNK = 500
+
+# Same-day ordering: invoices are posted before the payments made against them
+KIND_ORDER = {'invoice': 0, 'payment': 1}
+
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_safe(value):
+    """``value`` with a leading ``'`` if a spreadsheet would evaluate it as a formula."""
+    if value and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _invoice_entries(model, client_id):
+    return select(
+        literal('invoice').label('kind'),
+        literal(KIND_ORDER['invoice']).label('sort'),
+        model.id.label('ref_id'),
+        model.invoice_no.label('reference'),
+        model.due_date.label('date'),
+        model.description.label('description'),
+        model.amount.label('debit'),
+        literal(0.0).label('credit'),
+    ).where(model.client_id == client_id)
+
+
+def _payment_entries(payment_model, invoice_model, client_id):
+    return select(
+        literal('payment').label('kind'),
+        literal(KIND_ORDER['payment']).label('sort'),
+        payment_model.id.label('ref_id'),
+        invoice_model.invoice_no.label('reference'),
+        payment_model.date.label('date'),
+        payment_model.method.label('description'),
+        literal(0.0).label('debit'),
+        payment_model.amount.label('credit'),
+    ).join(invoice_model, payment_model.invoice_id == invoice_model.id) \
+     .where(invoice_model.client_id == client_id)
+
+
+def ledger_entries(client_id, include_archived=False):
+    """Subquery of every debit/credit entry for a client."""
+    parts = [_invoice_entries(Invoice, client_id),
+             _payment_entries(Payment, Invoice, client_id)]
+    if include_archived:
+        parts += [_invoice_entries(ArchivedInvoice, client_id),
+                  _payment_entries(ArchivedPayment, ArchivedInvoice, client_id)]
+    return union_all(*parts).subquery('entries')
+
+
+def _before(entries, start):
+    """Entries posted before ``start``; undated entries always count as history."""
+    return or_(entries.c.date.is_(None), entries.c.date < start)
+
+
+def balance_as_of(entries, start=None, end=None):
+    """Net balance of entries before ``start`` (opening) or up to ``end`` (closing)."""
+    stmt = select(func.coalesce(func.sum(entries.c.debit - entries.c.credit), 0.0))
+    if start is not None:
+        stmt = stmt.where(_before(entries, start))
+    elif end is not None:
+        stmt = stmt.where(or_(entries.c.date.is_(None), entries.c.date <= end))
+    return db.session.execute(stmt).scalar()
+
+
+def statement_rows(entries, start=None, end=None):
+    """Stream ledger rows in the date range, each carrying its running balance."""
+    order = (entries.c.date, entries.c.sort, entries.c.ref_id)
+    # The window runs over the full history so the balance already includes the opening
+    ledger = select(
+        entries,
+        func.sum(entries.c.debit - entries.c.credit)
+            .over(order_by=order, rows=(None, 0)).label('balance'),
+    ).subquery('ledger')
+
+    conditions = []
+    if start is not None:
+        conditions.append(ledger.c.date >= start)
+    if end is not None:
+        conditions.append(or_(ledger.c.date.is_(None), ledger.c.date <= end))
+    stmt = select(ledger).order_by(ledger.c.date, ledger.c.sort, ledger.c.ref_id)
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+
+    result = db.session.execute(stmt.execution_options(yield_per=STREAM_CHUNK))
+    for row in result:
+        yield {
+            'kind': row.kind,
+            'reference': row.reference,
+            'date': row.date.strftime('%Y-%m-%d') if row.date else None,
+            'description': row.description or '',
+            'debit': row.debit or 0.0,
+            'credit': row.credit or 0.0,
+            'balance': round(row.balance or 0.0, 2),
+        }
+
+
+class Statement:
+    """Statement for one client over an optional [start, end] date range."""
+
+    def __init__(self, client, start=None, end=None, include_archived=False):
+        self.client = client
+        self.start, self.end = start, end
+        self.entries = ledger_entries(client.id, include_archived)
+        self.opening_balance = round(balance_as_of(self.entries, start=start), 2) if start else 0.0
+        self.closing_balance = round(balance_as_of(self.entries, end=end), 2)
+
+    def rows(self):
+        return statement_rows(self.entries, self.start, self.end)
+
+    def header(self):
+        return {
+            'client_id': self.client.id,
+            'client_name': self.client.name,
+            'start': self.start.strftime('%Y-%m-%d') if self.start else None,
+            'end': self.end.strftime('%Y-%m-%d') if self.end else None,
+            'opening_balance': self.opening_balance,
+            'closing_balance': self.closing_balance,
+        }
+
+    def iter_json(self):
+        """Yield the statement as a JSON document, one entry at a time."""
+        header = json.dumps(self.header())
+        yield header[:-1] + ', "entries": ['
+        for i, row in enumerate(self.rows()):
+            yield (',' if i else '') + json.dumps(row)
+        yield ']}'
+
+    def iter_csv(self):
+        """Yield the statement as CSV lines, with opening and closing balance rows."""
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+
+        def flush():
+            data = buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            return data
+
+        writer.writerow(['Date', 'Type', 'Reference', 'Description', 'Debit', 'Credit', 'Balance'])
+        writer.writerow([self.header()['start'] or '', 'Opening balance', '', '', '', '', f'{self.opening_balance:.2f}'])
+        yield flush()
+        for i, row in enumerate(self.rows(), 1):
+            writer.writerow([row['date'] or '', row['kind'], csv_safe(row['reference']), csv_safe(row['description']),
+                             f"{row['debit']:.2f}", f"{row['credit']:.2f}", f"{row['balance']:.2f}"])
+            if i % STREAM_CHUNK == 0:
+                yield flush()
+        writer.writerow([self.header()['end'] or '', 'Closing balance', '', '', '', '', f'{self.closing_balance:.2f}'])
+        yield flush()
+
+
+def parse_range(args):
+    """(start, end) dates from ?start=YYYY-MM-DD&end=YYYY-MM-DD; raises ValueError on bad input."""
+    def parse(name):
+        value = args.get(name)
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    return parse('start'), parse('end')
+
+
+def statement_response(client, args, fmt='json'):
+    """Streamed JSON or CSV statement response for ``client`` from request args."""
+    try:
+        start, end = parse_range(args)
+    except ValueError:
+        abort(400)
+    statement = Statement(client, start, end, include_archived_requested(args))
+    if fmt == 'csv':
+        return Response(stream_with_context(statement.iter_csv()), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename=statement-{client.id}.csv'})
+    return Response(stream_with_context(statement.iter_json()), mimetype='application/json')
@@ -0,0 +1,28 @@
+document.addEventListener('DOMContentLoaded', function(){
+  const modal = document.getElementById('clientSelectModal');
+  if (!modal) return;
+  modal.addEventListener('show.bs.modal', function(){
+    const list = document.getElementById('clientList');
+    list.innerHTML = '<div class="text-muted">Loading...</div>';
+    fetch(modal.dataset.clientsUrl)
+      .then(r => r.json())
+      .then(data => {
+        list.innerHTML = '';
+        if (!data || !data.length) {
+          list.innerHTML = '<div class="text-muted">No clients found.</div>';
+          return;
+        }
+        data.forEach(c => {
+          const a = document.createElement('a');
+          a.className = 'list-group-item list-group-item-action d-flex justify-content-between align-items-center';
+          a.href = `/admin/impersonate/${c.id}`;
+          a.innerHTML = `<div><strong>${c.name}</strong><div class="small text-muted">${c.email} • ${c.company}</div></div><div class="btn btn-sm btn-outline-primary">View</div>`;
+          list.appendChild(a);
+        });
+      })
+      .catch(err => {
+        list.innerHTML = '<div class="text-danger">Failed to load clients.</div>';
+        console.error(err);
+      });
+  });
+});
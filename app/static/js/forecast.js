@@ -0,0 +1,79 @@
+// Cash-flow forecast card: fetches /dashboard/forecast.json and draws plain HTML bars
+document.addEventListener('DOMContentLoaded', function(){
+  const card = document.getElementById('forecast');
+  if (!card) return;
+
+  const bars = card.querySelector('.forecast-bars');
+  const months = card.querySelector('.forecast-months');
+  const sliders = card.querySelectorAll('[data-param]');
+  let horizon = 12;
+  let params = null;  // null until the first response fills in the historical defaults
+  let timer = null;
+
+  const money = v => '₱' + v.toLocaleString(undefined, {minimumFractionDigits: 2, maximumFractionDigits: 2});
+  const labels = {
+    late_rate: v => Math.round(v * 100) + '%',
+    late_days: v => Math.round(v) + ' days',
+    default_rate: v => Math.round(v * 100) + '%'
+  };
+
+  function render(data){
+    const max = Math.max(1, ...data.scheduled, ...data.expected);
+    bars.innerHTML = '';
+    months.innerHTML = '';
+    data.months.forEach(function(month, i){
+      const col = document.createElement('div');
+      col.className = 'flex-fill d-flex align-items-end gap-1 h-100';
+      col.title = `${month}: expected ${money(data.expected[i])} of ${money(data.scheduled[i])} scheduled`;
+      [['bg-secondary opacity-25', data.scheduled[i]], ['bg-success', data.expected[i]]].forEach(function([cls, value]){
+        const bar = document.createElement('div');
+        bar.className = 'flex-fill ' + cls;
+        bar.style.height = (value / max * 100) + '%';
+        col.appendChild(bar);
+      });
+      bars.appendChild(col);
+
+      const label = document.createElement('div');
+      label.className = 'flex-fill text-center';
+      label.textContent = month.slice(5) + '/' + month.slice(2, 4);
+      months.appendChild(label);
+    });
+    card.querySelectorAll('[data-total]').forEach(function(el){
+      const total = data.totals[el.dataset.total];
+      el.textContent = total === undefined ? '–' : money(total);
+    });
+  }
+
+  function load(){
+    const query = new URLSearchParams({horizon: horizon});
+    if (params) Object.keys(params).forEach(k => query.set(k, params[k]));
+    fetch(card.dataset.forecastUrl + '?' + query)
+      .then(r => r.json())
+      .then(function(data){
+        if (!params) {
+          params = {};
+          sliders.forEach(function(s){ s.value = data.params[s.dataset.param]; params[s.dataset.param] = s.value; });
+        }
+        sliders.forEach(s => card.querySelector(`[data-label="${s.dataset.param}"]`).textContent = labels[s.dataset.param](parseFloat(s.value)));
+        render(data);
+      })
+      .catch(err => console.error('Forecast failed', err));
+  }
+
+  sliders.forEach(function(s){
+    s.addEventListener('input', function(){
+      params[s.dataset.param] = s.value;
+      clearTimeout(timer);
+      timer = setTimeout(load, 150);
+    });
+  });
+  card.querySelectorAll('[data-horizon]').forEach(function(btn){
+    btn.addEventListener('click', function(){
+      card.querySelectorAll('[data-horizon]').forEach(b => b.classList.remove('active'));
+      btn.classList.add('active');
+      horizon = parseInt(btn.dataset.horizon, 10);
+      load();
+    });
+  });
+  load();
+});
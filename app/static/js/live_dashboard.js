@@ -0,0 +1,44 @@
+// Live dashboard: applies the delta events from /dashboard/events in place
+document.addEventListener('DOMContentLoaded', function(){
+  const root = document.getElementById('live-dashboard');
+  if (!root || !root.dataset.eventsUrl || !window.EventSource) return;
+
+  const MONEY = ['revenue', 'paid', 'outstanding'];
+  const RECENT_LIMIT = 5;
+
+  function applyTotals(totals){
+    Object.keys(totals || {}).forEach(function(name){
+      root.querySelectorAll(`[data-live-total="${name}"]`).forEach(function(el){
+        const value = parseFloat(el.dataset.value || '0') + totals[name];
+        el.dataset.value = value;
+        el.textContent = MONEY.includes(name) ? '₱' + value.toFixed(2) : String(Math.round(value));
+      });
+    });
+  }
+
+  function addRecentPayment(p){
+    const body = document.getElementById('recent-payments');
+    if (!body || !p) return;
+    const empty = body.querySelector('.empty-row');
+    if (empty) empty.remove();
+
+    const row = document.createElement('tr');
+    [p.client, p.invoice_no, p.installment ? 'Installment' : 'Full Payment',
+     '₱' + p.amount.toFixed(2), p.method || '', p.date].forEach(function(text){
+      const td = document.createElement('td');
+      td.textContent = text;
+      row.appendChild(td);
+    });
+    body.insertBefore(row, body.firstChild);
+    while (body.rows.length > RECENT_LIMIT) body.deleteRow(body.rows.length - 1);
+  }
+
+  const source = new EventSource(root.dataset.eventsUrl);
+  ['payment', 'payment_deleted', 'invoice_created', 'invoice_deleted', 'invoice_paid', 'invoices_bulk'].forEach(function(kind){
+    source.addEventListener(kind, function(e){
+      const data = JSON.parse(e.data);
+      applyTotals(data.totals);
+      if (kind === 'payment') addRecentPayment(data.payment);
+    });
+  });
+});
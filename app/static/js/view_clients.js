@@ -130,6 +130,47 @@ document.addEventListener('DOMContentLoaded', () => {
         }
       }
 
+      // statement (running balances are computed server-side)
+      const statementUrl = btn.dataset.statementUrl;
+      const statementBody = document.getElementById('statementBody');
+      if (statementUrl && statementBody) {
+        const csvLink = document.getElementById('statementCsv');
+        if (csvLink) csvLink.href = statementUrl + '.csv';
+        statementBody.innerHTML = `<tr><td colspan="6" class="text-center text-muted py-3">Loading...</td></tr>`;
+        fetch(statementUrl)
+          .then(r => r.json())
+          .then(statement => {
+            setText('statementOpening', formatCurrency(statement.opening_balance));
+            setText('statementClosing', formatCurrency(statement.closing_balance));
+            statementBody.innerHTML = '';
+            if (!statement.entries.length) {
+              statementBody.innerHTML = `<tr><td colspan="6" class="text-center text-muted py-3">No activity for this client.</td></tr>`;
+              return;
+            }
+            statement.entries.forEach(entry => {
+              // Built with textContent: reference and description (payment method) are user input
+              const tr = document.createElement('tr');
+              const cell = (text, className) => {
+                const td = document.createElement('td');
+                if (className) td.className = className;
+                td.textContent = text;
+                tr.appendChild(td);
+              };
+              cell(entry.date || '-');
+              cell(entry.reference || '-');
+              cell((entry.kind === 'payment' ? 'Payment' : 'Invoice') + (entry.description ? ' – ' + entry.description : ''));
+              cell(entry.debit ? formatCurrency(entry.debit) : '', 'text-end');
+              cell(entry.credit ? formatCurrency(entry.credit) : '', 'text-end text-success');
+              cell(formatCurrency(entry.balance), 'text-end fw-bold');
+              statementBody.appendChild(tr);
+            });
+          })
+          .catch(err => {
+            console.error("❌ Error loading statement:", err);
+            statementBody.innerHTML = `<tr><td colspan="6" class="text-center text-danger py-3">Could not load statement.</td></tr>`;
+          });
+      }
+
       if (modal) {
         modal.show();
       } else {
@@ -1,6 +1,8 @@
-from flask import abort
+from flask import abort, current_app, get_flashed_messages, stream_template
 from flask_login import current_user
 from functools import wraps
+from . import db
+from .models import Invoice, Payment
 
 def owner_required(f):
     """Decorator that restricts access to owners/admins only."""
@@ -16,4 +18,26 @@ def calculate_totals(invoices):
     total_revenue = sum((inv.amount or 0) for inv in invoices)
     total_paid = sum((inv.paid or 0) for inv in invoices)
     outstanding = total_revenue - total_paid
-    return total_revenue, total_paid, outstanding
\ No newline at end of file
+    return total_revenue, total_paid, outstanding
+
+def payment_stats(client_id=None):
+    """Map invoice_id -> (total_paid, explicit installment count) for installment invoices.
+
+    One grouped query instead of loading every invoice's payments; feed the values to
+    Invoice.installments_display_from / installments_paid_from.
+    """
+    explicit = db.case((Payment.installment_number > 0, Payment.installment_number))
+    q = (db.session.query(Payment.invoice_id,
+                          db.func.coalesce(db.func.sum(Payment.amount), 0.0),
+                          db.func.count(db.distinct(explicit)))
+         .join(Invoice, Payment.invoice_id == Invoice.id)
+         .filter(db.func.lower(Invoice.payment_type).like('install%')))
+    if client_id is not None:
+        q = q.filter(Invoice.client_id == client_id)
+    return {invoice_id: (total, count) for invoice_id, total, count in q.group_by(Payment.invoice_id)}
+
+def stream_page(template_name, **context):
+    """Stream a template so the first rows go out before the last one is rendered."""
+    # Pop flashed messages now, while the session cookie can still be updated
+    get_flashed_messages(with_categories=True)
+    return current_app.response_class(stream_template(template_name, **context))
\ No newline at end of file
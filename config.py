@@ -6,3 +6,77 @@ class Config:
     SECRET_KEY = os.environ.get('AIS_SECRET_KEY', 'dev-secret-key-change-this')
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'instance', 'ais.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Read/write routing (see app/routing.py). Read-only views use the 'replica' bind:
+    # a read-only connection to the same SQLite file unless a replica URL is given.
+    SQLALCHEMY_BINDS = {
+        'replica': os.environ.get('AIS_REPLICA_DATABASE_URL',
+                                  'sqlite:///file:' + os.path.join(BASE_DIR, 'instance', 'ais.db') + '?mode=ro&uri=true'),
+    }
+    DB_READ_ROUTING = os.environ.get('AIS_DB_READ_ROUTING', '1').lower() in ('1', 'true', 'yes')
+    DB_READ_YOUR_WRITES_SECONDS = float(os.environ.get('AIS_DB_READ_YOUR_WRITES_SECONDS', 5))
+
+    # Metrics (see app/metrics.py). Each process writes its snapshot to METRICS_DIR; totals
+    # of exited workers are kept in retired.json there. Clear the folder to reset them.
+    METRICS_ENABLED = os.environ.get('AIS_METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    METRICS_DIR = os.environ.get('AIS_METRICS_DIR', os.path.join(BASE_DIR, 'instance', 'metrics'))
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('AIS_METRICS_FLUSH_INTERVAL', 5))
+    METRICS_TOKEN = os.environ.get('AIS_METRICS_TOKEN')
+
+    # On-demand request profiling (see app/profiling.py)
+    PROFILE_DIR = os.environ.get('AIS_PROFILE_DIR', os.path.join(BASE_DIR, 'instance', 'profiles'))
+    PROFILE_INTERVAL = float(os.environ.get('AIS_PROFILE_INTERVAL', 0.005))
+    PROFILE_KEEP = int(os.environ.get('AIS_PROFILE_KEEP', 50))
+    PROFILE_TOKEN_MAX_AGE = int(os.environ.get('AIS_PROFILE_TOKEN_MAX_AGE', 3600))
+
+    # Cash-flow forecast (see app/forecast.py)
+    FORECAST_CACHE_SECONDS = int(os.environ.get('AIS_FORECAST_CACHE_SECONDS', 60))
+
+    # Archival of closed invoices (see app/archive.py)
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('AIS_ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('AIS_ARCHIVE_BATCH_SIZE', 500))
+
+    # Background job queue (see app/jobs.py). Set worker threads to 0 when running
+    # a dedicated `flask jobs worker` process instead.
+    JOBS_WORKER_THREADS = int(os.environ.get('AIS_JOBS_WORKER_THREADS', 2))
+    JOBS_POLL_INTERVAL = float(os.environ.get('AIS_JOBS_POLL_INTERVAL', 0.5))
+    JOBS_MAX_ATTEMPTS = int(os.environ.get('AIS_JOBS_MAX_ATTEMPTS', 5))
+    # A job still 'running' this long after its claim is retried (its worker died)
+    JOBS_LEASE_SECONDS = int(os.environ.get('AIS_JOBS_LEASE_SECONDS', 300))
+    # Finished jobs older than this are deleted by idle workers and `flask jobs prune`
+    JOBS_KEEP_DONE_SECONDS = int(os.environ.get('AIS_JOBS_KEEP_DONE_SECONDS', 86400))
+
+    # Outgoing email for reminders and receipts (see app/notifications.py)
+    MAIL_ENABLED = os.environ.get('AIS_MAIL_ENABLED', '').lower() in ('1', 'true', 'yes')
+    MAIL_SERVER = os.environ.get('AIS_MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.environ.get('AIS_MAIL_PORT', 8025))
+    MAIL_USE_TLS = os.environ.get('AIS_MAIL_USE_TLS', '').lower() in ('1', 'true', 'yes')
+    MAIL_USERNAME = os.environ.get('AIS_MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('AIS_MAIL_PASSWORD')
+    MAIL_SENDER = os.environ.get('AIS_MAIL_SENDER', 'billing@accounting.com')
+    MAIL_MAX_CONNECTIONS = int(os.environ.get('AIS_MAIL_MAX_CONNECTIONS', 4))
+    MAIL_BATCH_SIZE = int(os.environ.get('AIS_MAIL_BATCH_SIZE', 200))
+
+    # Password hashing (see app/passwords.py). Any Werkzeug method string, e.g.
+    # 'pbkdf2:sha256:600000' (Werkzeug's default) or 'scrypt:32768:8:1'. Hashes with a
+    # lower cost or another algorithm are upgraded on the next login.
+    PASSWORD_HASH_METHOD = os.environ.get('AIS_PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    # At most LOGIN_HASH_SLOTS hashes run at once across all processes on the host;
+    # a login waiting longer than LOGIN_HASH_QUEUE_TIMEOUT for a slot gets a 503.
+    LOGIN_HASH_SLOTS = int(os.environ.get('AIS_LOGIN_HASH_SLOTS', 2))
+    LOGIN_HASH_SLOT_DIR = os.environ.get('AIS_LOGIN_HASH_SLOT_DIR', os.path.join(BASE_DIR, 'instance', 'login_slots'))
+    LOGIN_HASH_QUEUE_TIMEOUT = float(os.environ.get('AIS_LOGIN_HASH_QUEUE_TIMEOUT', 0.5))
+
+    # Template rendering (see app/fragments.py)
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('AIS_FRAGMENT_CACHE_SIZE', 20000))
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('AIS_JINJA_BYTECODE_CACHE_DIR',
+                                              os.path.join(BASE_DIR, 'instance', 'jinja_cache'))
+
+    # Live updates over Server-Sent Events (see app/events.py). Off by default: every
+    # open dashboard holds a connection, so enable it only with a worker class that
+    # handles many idle connections (gunicorn -k gevent, or -k gthread --threads N).
+    EVENTS_ENABLED = os.environ.get('AIS_EVENTS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    EVENTS_POLL_INTERVAL = float(os.environ.get('AIS_EVENTS_POLL_INTERVAL', 0.5))
+    EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('AIS_EVENTS_HEARTBEAT_SECONDS', 15))
+    EVENTS_RETENTION_SECONDS = int(os.environ.get('AIS_EVENTS_RETENTION_SECONDS', 3600))
+    EVENTS_QUEUE_SIZE = int(os.environ.get('AIS_EVENTS_QUEUE_SIZE', 100))
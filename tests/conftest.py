@@ -0,0 +1,38 @@
+import pytest
+
+from app import create_app, db
+from app.models import User
+
+
+@pytest.fixture
+def app(tmp_path):
+    database = tmp_path / 'ais.db'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}',
+        'SQLALCHEMY_BINDS': {'replica': f'sqlite:///file:{database}?mode=ro&uri=true'},
+        'METRICS_DIR': str(tmp_path / 'metrics'),
+        'PROFILE_DIR': str(tmp_path / 'profiles'),
+        'JINJA_BYTECODE_CACHE_DIR': str(tmp_path / 'jinja_cache'),
+        'LOGIN_HASH_SLOT_DIR': str(tmp_path / 'login_slots'),
+        'JOBS_WORKER_THREADS': 0,
+        # Cheap hashes keep logins fast in tests
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    })
+    with app.app_context():
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def owner_client(app):
+    """Test client logged in as an owner."""
+    owner = User(username='owner@example.com', role='owner')
+    owner.set_password('secret')
+    db.session.add(owner)
+    db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'owner@example.com', 'password': 'secret'})
+    return client
@@ -0,0 +1,83 @@
+from datetime import date
+
+from sqlalchemy import text
+
+from app import db
+from app.archive import (archive_closed_invoices, archived_totals, client_invoices, client_payments,
+                         include_archived_requested)
+from app.models import ArchivedInvoice, Client, Invoice, Payment
+
+OLD = date(2020, 1, 15)
+CUTOFF = date(2021, 1, 1)
+
+
+def _ledger():
+    client = Client(name='Alice', email='alice@example.com')
+    db.session.add(client)
+    db.session.flush()
+    invoices = [
+        Invoice(invoice_no='T-1', client_id=client.id, amount=100.0, paid=100.0, status='paid', due_date=OLD),
+        Invoice(invoice_no='T-2', client_id=client.id, amount=200.0, paid=200.0, status='paid', due_date=OLD),
+        Invoice(invoice_no='T-3', client_id=client.id, amount=300.0, paid=300.0, status='paid', due_date=OLD),
+        # Unpaid, and paid but recently settled: both stay live
+        Invoice(invoice_no='T-4', client_id=client.id, amount=50.0, paid=0.0, status='pending', due_date=OLD),
+        Invoice(invoice_no='T-5', client_id=client.id, amount=80.0, paid=80.0, status='paid', due_date=OLD),
+    ]
+    db.session.add_all(invoices)
+    db.session.flush()
+    db.session.add_all([Payment(invoice_id=inv.id, amount=inv.paid, date=OLD) for inv in invoices[:3]])
+    db.session.add(Payment(invoice_id=invoices[4].id, amount=80.0, date=date.today()))
+    db.session.commit()
+    return client
+
+
+def test_archives_closed_invoices_in_chunks(app):
+    client = _ledger()
+
+    assert archive_closed_invoices(CUTOFF, batch_size=2) == (3, 3)
+
+    assert sorted(inv.invoice_no for inv in Invoice.query) == ['T-4', 'T-5']
+    assert Payment.query.count() == 1
+    assert sorted(inv.invoice_no for inv in ArchivedInvoice.query) == ['T-1', 'T-2', 'T-3']
+    assert archived_totals(client.id) == (600.0, 600.0)
+
+    assert sorted(inv.invoice_no for inv in client_invoices(client.id)) == ['T-4', 'T-5']
+    assert sorted(inv.invoice_no for inv in client_invoices(client.id, include_archived=True)) == \
+        ['T-1', 'T-2', 'T-3', 'T-4', 'T-5']
+    assert len(client_payments(client.id)) == 1
+    assert len(client_payments(client.id, include_archived=True)) == 4
+
+    # A second run finds nothing left to move
+    assert archive_closed_invoices(CUTOFF) == (0, 0)
+
+
+def test_include_archived_flag():
+    assert include_archived_requested({'include_archived': '1'})
+    assert include_archived_requested({'include_archived': 'true'})
+    assert not include_archived_requested({'include_archived': '0'})
+    assert not include_archived_requested({})
+
+
+def test_upgrade_ids_command_stops_id_reuse(app):
+    client = _ledger()
+    archive_closed_invoices(CUTOFF)
+    # Recreate invoice as a plain rowid table, as in databases made before AUTOINCREMENT
+    with db.engine.begin() as conn:
+        ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'invoice'")).scalar()
+        conn.exec_driver_sql('CREATE TABLE invoice_plain AS SELECT * FROM invoice')
+        conn.exec_driver_sql('DROP TABLE invoice')
+        conn.exec_driver_sql(ddl.replace('AUTOINCREMENT', ''))
+        conn.exec_driver_sql('INSERT INTO invoice SELECT * FROM invoice_plain')
+        conn.exec_driver_sql('DROP TABLE invoice_plain')
+        # Without AUTOINCREMENT the next id would be 1 again, an archived id
+        conn.exec_driver_sql('DELETE FROM payment')
+        conn.exec_driver_sql('DELETE FROM invoice')
+
+    result = app.test_cli_runner().invoke(args=['archive', 'upgrade-ids'])
+    assert 'Upgraded invoice' in result.output
+
+    new = Invoice(invoice_no='T-6', client_id=client.id, amount=1.0)
+    db.session.add(new)
+    db.session.commit()
+    assert new.id > max(inv.id for inv in ArchivedInvoice.query)
+    assert 'Nothing to do' in app.test_cli_runner().invoke(args=['archive', 'upgrade-ids']).output
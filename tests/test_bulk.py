@@ -0,0 +1,65 @@
+import time
+from datetime import date, datetime
+
+from sqlalchemy import insert
+
+from app import bulk, db
+from app.ledger import check_range
+from app.models import Client, Invoice, Job, Payment
+
+BATCH = 10000
+
+
+def test_mark_paid_keeps_overpaid_totals_consistent(app):
+    client = Client(name='Alice', email='alice@example.com')
+    db.session.add(client)
+    db.session.flush()
+    open_invoice = Invoice(invoice_no='T-1', client_id=client.id, amount=100.0, paid=40.0, status='partial')
+    overpaid = Invoice(invoice_no='T-2', client_id=client.id, amount=100.0, paid=120.0, status='partial')
+    db.session.add_all([open_invoice, overpaid])
+    db.session.flush()
+    db.session.add_all([Payment(invoice_id=open_invoice.id, amount=40.0, date=date.today()),
+                        Payment(invoice_id=overpaid.id, amount=120.0, date=date.today())])
+    db.session.commit()
+
+    summary = bulk.mark_paid([open_invoice.id, overpaid.id])
+
+    assert summary['invoices'] == 2
+    assert summary['payments'] == 1
+    assert summary['amount'] == 60.0
+    db.session.expire_all()
+    assert db.session.get(Invoice, overpaid.id).paid == 120.0
+    assert db.session.get(Invoice, overpaid.id).status == 'paid'
+    result = check_range(open_invoice.id, overpaid.id, engine=db.engine)
+    assert result['totals'] == 0
+    # Only the invoice that got a payment is refreshed, as with the single-invoice route
+    assert [job.dedupe_key for job in Job.query] == [f'refresh_invoice:{open_invoice.id}']
+    assert Payment.query.filter_by(method='Marked paid').one().date == datetime.utcnow().date()
+
+
+def test_bulk_actions_on_ten_thousand_invoices_benchmark(app):
+    db.session.execute(insert(Client), [{'name': f'Client {i}', 'email': f'c{i}@example.com'}
+                                        for i in range(BATCH)])
+    db.session.commit()
+    client_ids = [row[0] for row in db.session.query(Client.id)]
+    template = {'description': 'Retainer', 'amount': 100.0, 'due_date': date(2026, 12, 1),
+                'payment_type': 'Full Payment', 'installments': 1, 'frequency': 'monthly'}
+    timings = {}
+
+    start = time.perf_counter()
+    created = bulk.create_invoices(client_ids, template)
+    timings['create'] = time.perf_counter() - start
+    ids = [row[0] for row in db.session.query(Invoice.id)]
+
+    start = time.perf_counter()
+    paid = bulk.mark_paid(ids)
+    timings['mark_paid'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    deleted = bulk.delete(ids)
+    timings['delete'] = time.perf_counter() - start
+
+    assert created['invoices'] == paid['invoices'] == paid['payments'] == deleted['invoices'] == BATCH
+    assert Invoice.query.count() == 0
+    assert Job.query.filter_by(name='refresh_invoice').count() == BATCH
+    assert sum(timings.values()) < 30
@@ -0,0 +1,54 @@
+import re
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import db
+from app.models import Client, Invoice, Payment
+
+
+def test_paid_total_includes_every_invoice(owner_client):
+    client = Client(name='Alice', email='alice@example.com')
+    db.session.add(client)
+    db.session.flush()
+    full = Invoice(invoice_no='T-1', client_id=client.id, amount=10000.0, paid=10000.0, status='paid')
+    plan = Invoice(invoice_no='T-2', client_id=client.id, amount=60000.0, paid=20000.0, status='partial',
+                   payment_type='Installment', installments=3)
+    db.session.add_all([full, plan])
+    db.session.flush()
+    db.session.add_all([Payment(invoice_id=full.id, amount=10000.0, date=date.today()),
+                        Payment(invoice_id=plan.id, amount=20000.0, date=date.today())])
+    db.session.commit()
+
+    html = owner_client.get('/dashboard').get_data(as_text=True)
+    totals = dict(re.findall(r'data-live-total="(\w+)"[^>]*>([^<]*)<', html))
+    assert totals['paid'] == '₱30000.00'
+    assert totals['outstanding'] == '₱40000.00'
+
+
+def test_dashboard_query_count_does_not_grow_with_invoices(owner_client):
+    clients = [Client(name=f'Client {i}', email=f'client{i}@example.com') for i in range(30)]
+    db.session.add_all(clients)
+    db.session.flush()
+    invoices = [Invoice(invoice_no=f'T-{c.id}', client_id=c.id, amount=300.0, status='pending',
+                        payment_type='Installment', installments=3) for c in clients]
+    db.session.add_all(invoices)
+    db.session.commit()
+    # Nothing cached in the session: every client the page touches has to be loaded
+    for obj in clients + invoices:
+        db.session.expunge(obj)
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        html = owner_client.get('/dashboard').get_data(as_text=True)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+
+    assert 'Client 29' in html
+    assert len(statements) < 10
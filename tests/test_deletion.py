@@ -0,0 +1,69 @@
+import time
+from datetime import date
+
+from sqlalchemy import insert
+
+from app import db
+from app.deletion import delete_client_data, delete_invoices
+from app.models import ArchivedInvoice, ArchivedPayment, Client, Event, Invoice, Payment
+
+EXPECTED = {'payments': 2, 'invoices': 2, 'archived_payments': 1, 'archived_invoices': 1,
+            'events': 1, 'clients': 1}
+
+
+def _client_with_ledger(name):
+    client = Client(name=name, email=f'{name.lower()}@example.com')
+    db.session.add(client)
+    db.session.flush()
+    invoices = [Invoice(invoice_no=f'{name}-{n}', client_id=client.id, amount=100.0) for n in range(2)]
+    db.session.add_all(invoices)
+    db.session.flush()
+    db.session.add_all([Payment(invoice_id=inv.id, amount=10.0, date=date.today()) for inv in invoices])
+    archived = ArchivedInvoice(id=1000 + client.id, invoice_no=f'{name}-A', client_id=client.id, amount=5.0)
+    db.session.add(archived)
+    db.session.flush()
+    db.session.add(ArchivedPayment(id=1000 + client.id, invoice_id=archived.id, amount=5.0))
+    db.session.add(Event(channel=f'client:{client.id}', kind='payment', payload='{}'))
+    db.session.commit()
+    return client.id
+
+
+def _row_counts():
+    return {model.__name__: model.query.count()
+            for model in (Client, Invoice, Payment, ArchivedInvoice, ArchivedPayment, Event)}
+
+
+def test_dry_run_counts_then_delete(app):
+    alice = _client_with_ledger('Alice')
+    _client_with_ledger('Bob')
+    before = _row_counts()
+
+    assert delete_client_data(alice, dry_run=True) == EXPECTED
+    assert _row_counts() == before
+
+    assert delete_client_data(alice) == EXPECTED
+    assert _row_counts() == {name: count // 2 for name, count in before.items()}
+    assert db.session.get(Client, alice) is None
+
+
+def test_delete_invoices_removes_their_payments(app):
+    _client_with_ledger('Alice')
+    ids = [inv.id for inv in Invoice.query]
+    assert delete_invoices(ids, dry_run=True) == {'payments': 2, 'invoices': 2}
+    assert delete_invoices(ids) == {'payments': 2, 'invoices': 2}
+    assert Payment.query.count() == Invoice.query.count() == 0
+
+
+def test_deleting_a_client_with_100k_payments_is_fast(app):
+    client_id = _client_with_ledger('Big')
+    invoice_id = Invoice.query.first().id
+    db.session.execute(insert(Payment), [{'invoice_id': invoice_id, 'amount': 1.0, 'date': date.today()}
+                                         for _ in range(100_000)])
+    db.session.commit()
+
+    start = time.perf_counter()
+    counts = delete_client_data(client_id)
+    elapsed = time.perf_counter() - start
+
+    assert counts['payments'] == 100_002
+    assert elapsed < 2
@@ -0,0 +1,36 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.forecast import forecast
+
+
+@pytest.mark.parametrize('query', ['horizon=nan', 'late_days=nan', 'late_rate=inf', 'default_rate=-inf'])
+def test_non_finite_parameters_are_rejected(owner_client, query):
+    response = owner_client.get(f'/dashboard/forecast.json?{query}')
+    assert response.status_code == 400
+    assert 'finite' in response.json['error']
+
+
+def test_forecast_rejects_non_finite_scenario():
+    plans = {'amount': np.array([100.0]), 'paid': np.array([0.0]), 'count': np.array([1]),
+             'period': np.array([30.4375]), 'due': np.array(['2026-11-05'], dtype='datetime64[D]')}
+    with pytest.raises(ValueError):
+        forecast(plans, late_days=float('nan'))
+
+
+def test_one_million_plans_benchmark():
+    n = 1_000_000
+    rng = np.random.default_rng(0)
+    amount = rng.uniform(100, 100000, n)
+    plans = {'amount': amount, 'paid': amount * rng.uniform(0, 0.9, n),
+             'count': rng.integers(1, 13, n), 'period': rng.choice([7.0, 14.0, 30.4375], n),
+             'due': np.datetime64('2026-06-01') + rng.integers(0, 365, n).astype('timedelta64[D]')}
+
+    start = time.perf_counter()
+    result = forecast(plans, horizon=12, late_rate=0.3, late_days=20, default_rate=0.05)
+    elapsed = time.perf_counter() - start
+
+    assert len(result['expected']) == 12
+    assert elapsed < 10
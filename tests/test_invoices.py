@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models import Client, Invoice, Job, Payment
+
+
+def _invoice(amount, paid):
+    client = Client.query.first()
+    if client is None:
+        client = Client(name='Alice', email='alice@example.com')
+        db.session.add(client)
+        db.session.flush()
+    invoice = Invoice(invoice_no=f'T-{Invoice.query.count() + 1}', client_id=client.id,
+                      amount=amount, paid=paid, status='partial')
+    db.session.add(invoice)
+    db.session.flush()
+    if paid:
+        db.session.add(Payment(invoice_id=invoice.id, amount=paid, date=date.today()))
+    db.session.commit()
+    return invoice.id
+
+
+def test_mark_paid_settles_the_open_balance(owner_client):
+    invoice_id = _invoice(100.0, 30.0)
+    assert owner_client.post(f'/invoices/mark_paid/{invoice_id}').status_code == 302
+
+    invoice = db.session.get(Invoice, invoice_id)
+    assert (invoice.paid, invoice.status) == (100.0, 'paid')
+    assert [p.amount for p in Payment.query.filter_by(method='Marked paid')] == [70.0]
+    assert Job.query.filter_by(dedupe_key=f'refresh_invoice:{invoice_id}').count() == 1
+
+
+def test_mark_paid_keeps_overpaid_amount(owner_client):
+    invoice_id = _invoice(100.0, 120.0)
+    assert owner_client.post(f'/invoices/mark_paid/{invoice_id}').status_code == 302
+
+    invoice = db.session.get(Invoice, invoice_id)
+    assert (invoice.paid, invoice.status) == (120.0, 'paid')
+    assert Payment.query.filter_by(invoice_id=invoice_id).count() == 1
+    assert Job.query.count() == 0
+
+
+@pytest.mark.parametrize('all_clients, created', [('1', 2), (True, 2), ('0', 0), ('false', 0), (False, 0)])
+def test_bulk_create_all_clients_needs_an_explicit_yes(owner_client, all_clients, created):
+    db.session.add_all([Client(name='Alice', email='alice@example.com'), Client(name='Bob', email='bob@example.com')])
+    db.session.commit()
+    response = owner_client.post('/invoices/bulk/create', json={'all_clients': all_clients, 'amount': 50})
+    assert response.status_code == 200
+    assert response.json['invoices'] == created
+
+
+@pytest.mark.parametrize('amount', ['abc', 'nan', [1]])
+def test_bulk_create_rejects_bad_amount(owner_client, amount):
+    client = Client(name='Alice', email='alice@example.com')
+    db.session.add(client)
+    db.session.commit()
+    response = owner_client.post('/invoices/bulk/create', json={'client_ids': [client.id], 'amount': amount})
+    assert response.status_code == 400
+    assert Invoice.query.count() == 0
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, jobs
+from app.models import Job
+
+
+@pytest.fixture
+def failing_handler(monkeypatch):
+    def fail():
+        raise RuntimeError('boom')
+    monkeypatch.setitem(jobs.HANDLERS, 'fail', fail)
+
+
+def _enqueue(name='refresh_invoice', **kwargs):
+    job = jobs.enqueue(name, **kwargs)
+    db.session.commit()
+    return job.id
+
+
+def test_claim_runs_each_due_job_once(app):
+    job_id = _enqueue(invoice_id=1)
+    _enqueue(delay=60, invoice_id=2)
+
+    job = jobs.claim_next()
+    assert (job.id, job.status, job.attempts) == (job_id, 'running', 1)
+    assert jobs.claim_next() is None  # one is running, the other not due yet
+
+    jobs.run_job(job)
+    assert db.session.get(Job, job_id).status == 'done'
+
+
+def test_expired_lease_is_claimed_again_until_attempts_run_out(app):
+    job_id = _enqueue(invoice_id=1)
+    stale = datetime.utcnow() - timedelta(seconds=app.config['JOBS_LEASE_SECONDS'] + 1)
+    jobs.claim_next()
+    db.session.get(Job, job_id).updated_at = stale
+    db.session.commit()
+
+    job = jobs.claim_next()
+    assert (job.id, job.attempts) == (job_id, 2)
+    assert job.last_error.startswith('Lease expired')
+
+    job.attempts = job.max_attempts
+    job.updated_at = stale
+    db.session.commit()
+    assert jobs.claim_next() is None
+    assert db.session.get(Job, job_id).status == 'failed'
+
+
+def test_failed_job_backs_off_then_gives_up(app, failing_handler):
+    job_id = _enqueue('fail')
+    jobs.run_job(jobs.claim_next())
+
+    job = db.session.get(Job, job_id)
+    assert job.status == 'pending'
+    assert job.last_error == 'RuntimeError: boom'
+    assert job.run_after > datetime.utcnow() + timedelta(seconds=1)
+    assert jobs.claim_next() is None  # still backing off
+
+    job.attempts = job.max_attempts - 1
+    job.run_after = datetime.utcnow()
+    db.session.commit()
+    jobs.run_job(jobs.claim_next())
+    assert db.session.get(Job, job_id).status == 'failed'
+
+
+@pytest.mark.parametrize('status, deduped', [('pending', True), ('running', True), ('done', False)])
+def test_dedupe_matches_queued_and_running_jobs(app, status, deduped):
+    job = jobs.enqueue_invoice_refresh(1)
+    job.status = status
+    db.session.commit()
+
+    again = jobs.enqueue_invoice_refresh(1)
+    db.session.commit()
+    assert (again.id == job.id) is deduped
+
+
+def test_prune_deletes_only_old_finished_jobs(app):
+    old = datetime.utcnow() - timedelta(seconds=app.config['JOBS_KEEP_DONE_SECONDS'] + 1)
+    rows = {status_age: _enqueue(invoice_id=n)
+            for n, status_age in enumerate([('done', old), ('done', None), ('failed', old), ('pending', old)])}
+    for (status, age), job_id in rows.items():
+        job = db.session.get(Job, job_id)
+        job.status = status
+        if age:
+            job.updated_at = age
+    db.session.commit()
+
+    assert jobs.prune_done() == 1
+    assert db.session.get(Job, rows['done', old]) is None
+    assert Job.query.count() == 3
+
+
+def test_enqueue_many_skips_already_queued_keys(app):
+    jobs.enqueue_invoice_refresh(1)
+    db.session.commit()
+    assert jobs.enqueue_invoice_refreshes([1, 2, 3]) == 2
+    db.session.commit()
+    assert sorted(job.dedupe_key for job in Job.query) == [f'refresh_invoice:{n}' for n in (1, 2, 3)]
+    assert db.session.get(Job, 3).payload == '{"invoice_id": 3}'
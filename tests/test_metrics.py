@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from app import metrics
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _snapshot(count):
+    return {'ais_payments_recorded_total': {
+        'type': 'counter', 'help': 'Payments committed.', 'labels': [], 'buckets': None,
+        'samples': {'[]': count}}}
+
+
+def _write(folder, name, data):
+    with open(os.path.join(folder, name), 'w') as f:
+        json.dump(data, f)
+
+
+def _payments(app):
+    return metrics.aggregate(app)['ais_payments_recorded_total']['samples']['[]']
+
+
+def test_dead_snapshots_are_retired_and_totals_never_go_backwards(app):
+    folder = app.config['METRICS_DIR']
+    metrics.write_snapshot(app)
+    own = metrics.PAYMENTS.snapshot().get('[]', 0)
+    dead = f'{_dead_pid()}-12345.json'
+    _write(folder, dead, _snapshot(7))
+
+    assert _payments(app) == own + 7
+    assert dead not in os.listdir(folder)
+    assert metrics.RETIRED in os.listdir(folder)
+
+    # Another exited worker: added to what was retired before
+    _write(folder, f'{_dead_pid()}-23456.json', _snapshot(3))
+    assert _payments(app) == own + 10
+    assert _payments(app) == own + 10
+
+
+def test_reused_pid_does_not_hide_or_overwrite_a_dead_worker(app):
+    folder = app.config['METRICS_DIR']
+    metrics.write_snapshot(app)
+    own = metrics.PAYMENTS.snapshot().get('[]', 0)
+    # Same PID as this process, but written by an earlier process with another start time
+    _write(folder, f'{os.getpid()}-1.json', _snapshot(5))
+
+    assert metrics.snapshot_name() != f'{os.getpid()}-1.json'
+    assert _payments(app) == own + 5
+    assert f'{os.getpid()}-1.json' not in os.listdir(folder)
+
+
+def test_instrumentation_overhead_is_microseconds(app, monkeypatch):
+    """Benchmark: the before/after/teardown hooks of one request."""
+    def hook(funcs):
+        return next(f for f in funcs if f.__module__ == metrics.__name__)
+
+    start_timer = hook(app.before_request_funcs[None])
+    record_status = hook(app.after_request_funcs[None])
+    observe = hook(app.teardown_request_funcs[None])
+    response = app.response_class('ok')
+    monkeypatch.setattr(metrics, '_flusher_started', True)  # as after the first request
+
+    rounds = 20000
+    with app.test_request_context('/invoices'):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            start_timer()
+            record_status(response)
+            observe(None)
+        per_request = (time.perf_counter() - start) / rounds * 1e6
+
+    assert per_request < 100
@@ -0,0 +1,100 @@
+import smtplib
+import socket
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from app import db
+from app.models import Client, Invoice
+from app.notifications import SMTPPool, send_overdue_reminders
+
+aiosmtpd = pytest.importorskip('aiosmtpd.controller')
+
+CLIENTS = 1000
+
+
+class Collector:
+    """aiosmtpd handler that keeps every delivered message and counts sessions."""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(app):
+    handler = Collector()
+    controller = aiosmtpd.Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=controller.port)
+    yield handler
+    controller.stop()
+
+
+def _overdue_invoices(clients, per_client=2):
+    past = date.today() - timedelta(days=10)
+    db.session.add_all([Client(name=f'Client {i}', email=f'client{i}@example.com') for i in range(clients)])
+    db.session.flush()
+    db.session.add_all([Invoice(invoice_no=f'T-{c.id}-{n}', client_id=c.id, amount=100.0, due_date=past)
+                        for c in Client.query.all() for n in range(per_client)])
+    db.session.commit()
+
+
+def test_overdue_reminders_throughput(app, smtp_server):
+    _overdue_invoices(CLIENTS)
+    app.config.update(MAIL_BATCH_SIZE=200, MAIL_MAX_CONNECTIONS=4)
+
+    start = time.perf_counter()
+    result = send_overdue_reminders()
+    elapsed = time.perf_counter() - start
+
+    assert result == {'invoices': CLIENTS * 2, 'messages': CLIENTS, 'sent': CLIENTS, 'failed': 0}
+    assert len(smtp_server.messages) == CLIENTS
+    # Every message goes over one of the pooled connections
+    assert len(smtp_server.sessions) <= 4
+    # Runs at ~300 messages/s here; the bound leaves room for slow CI machines
+    assert CLIENTS / elapsed > 100
+
+
+def test_dry_run_counts_without_sending(app, smtp_server):
+    _overdue_invoices(5, per_client=3)
+    assert send_overdue_reminders(dry_run=True) == {'invoices': 15, 'messages': 5, 'sent': 0, 'failed': 0}
+    assert smtp_server.messages == []
+
+
+class FakeSMTP:
+    opened = []
+
+    def __init__(self, fail):
+        self.fail, self.closed = fail, False
+        FakeSMTP.opened.append(self)
+
+    def send_message(self, message):
+        raise self.fail
+
+    def close(self):
+        self.closed = True
+
+
+def test_failed_retry_closes_the_new_connection(monkeypatch):
+    FakeSMTP.opened = []
+    failures = iter([smtplib.SMTPServerDisconnected(), smtplib.SMTPDataError(554, b'rejected')])
+    pool = SMTPPool('localhost', 25)
+    monkeypatch.setattr(pool, '_connect', lambda: FakeSMTP(next(failures)))
+
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.send(object())
+    assert len(FakeSMTP.opened) == 2
+    assert all(conn.closed for conn in FakeSMTP.opened)
@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from app import db, passwords
+from app.models import User
+from app.passwords import LoginBusy, needs_rehash, verify_password
+
+fcntl = pytest.importorskip('fcntl')
+
+
+def _hold_slots(folder, slots, ready, release):
+    """Another worker process holding every verification slot."""
+    files = []
+    for i in range(slots):
+        f = open(os.path.join(folder, f'slot-{i}.lock'), 'a')
+        fcntl.flock(f, fcntl.LOCK_EX)
+        files.append(f)
+    ready.set()
+    release.wait(10)
+
+
+def test_slots_are_shared_across_processes(app):
+    app.config.update(LOGIN_HASH_SLOTS=2, LOGIN_HASH_QUEUE_TIMEOUT=0.2)
+    folder = app.config['LOGIN_HASH_SLOT_DIR']
+    os.makedirs(folder, exist_ok=True)
+    pwhash = passwords.hash_password('secret')
+
+    ctx = multiprocessing.get_context('fork')
+    ready, release = ctx.Event(), ctx.Event()
+    holder = ctx.Process(target=_hold_slots, args=(folder, 2, ready, release))
+    holder.start()
+    try:
+        assert ready.wait(5)
+        start = time.monotonic()
+        with pytest.raises(LoginBusy):
+            verify_password(pwhash, 'secret')
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+        holder.join()
+    # The slots are free again once the holder exits
+    assert verify_password(pwhash, 'secret')
+
+
+@pytest.mark.parametrize('stored, rehash', [
+    ('pbkdf2:sha256:600000', False),
+    ('pbkdf2:sha256:1000000', False),  # a stronger hash is never downgraded
+    ('pbkdf2:sha256:260000', True),
+    ('pbkdf2:sha512:600000', True),
+    ('scrypt:32768:8:1', True),
+])
+def test_needs_rehash_only_for_weaker_or_other_methods(app, stored, rehash):
+    app.config.update(PASSWORD_HASH_METHOD='pbkdf2:sha256:600000')
+    assert needs_rehash(f'{stored}$salt$hash') is rehash
+
+
+def test_login_upgrades_hash_inside_verification_slot(app, monkeypatch):
+    user = User(username='client@example.com', role='client')
+    user.set_password('secret')
+    app.config.update(PASSWORD_HASH_METHOD='pbkdf2:sha256:2000')
+
+    in_slot = False
+    hashed_in_slot = []
+    slot = passwords.verification_slot
+
+    @contextmanager
+    def tracking_slot():
+        nonlocal in_slot
+        with slot():
+            in_slot = True
+            try:
+                yield
+            finally:
+                in_slot = False
+
+    generate = passwords.generate_password_hash
+
+    def tracking_generate(password, method):
+        hashed_in_slot.append(in_slot)
+        return generate(password, method=method)
+
+    monkeypatch.setattr(passwords, 'verification_slot', tracking_slot)
+    monkeypatch.setattr(passwords, 'generate_password_hash', tracking_generate)
+
+    assert not user.check_password('wrong')
+    assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+    assert user.check_password('secret')
+    assert user.password_hash.startswith('pbkdf2:sha256:2000$')
+    assert hashed_in_slot and all(hashed_in_slot)
+
+
+def test_login_burst_throughput_and_other_endpoint_latency(app, monkeypatch):
+    """Benchmark: a burst of real-cost logins next to a cheap endpoint."""
+    app.config.update(PASSWORD_HASH_METHOD='pbkdf2:sha256:600000', LOGIN_HASH_SLOTS=2,
+                      LOGIN_HASH_QUEUE_TIMEOUT=0.5)
+    user = User(username='client@example.com', role='client')
+    user.set_password('secret')
+    db.session.add(user)
+    db.session.commit()
+
+    running = peak = 0
+    counter_lock = threading.Lock()
+    check = passwords.check_password_hash
+
+    def counting_check(pwhash, password):
+        nonlocal running, peak
+        with counter_lock:
+            running += 1
+            peak = max(peak, running)
+        try:
+            return check(pwhash, password)
+        finally:
+            with counter_lock:
+                running -= 1
+
+    monkeypatch.setattr(passwords, 'check_password_hash', counting_check)
+
+    def probe_latencies(stop):
+        client, latencies = app.test_client(), []
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get('/login')
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    idle_stop = threading.Event()
+    threading.Timer(1.0, idle_stop.set).start()
+    idle = probe_latencies(idle_stop)
+
+    statuses = []
+
+    def login_loop():
+        client = app.test_client()
+        for _ in range(4):
+            response = client.post('/login', data={'username': 'client@example.com', 'password': 'secret'})
+            statuses.append(response.status_code)
+            client.get('/logout')
+
+    burst_stop = threading.Event()
+    results = {}
+    probe = threading.Thread(target=lambda: results.setdefault('busy', probe_latencies(burst_stop)))
+    probe.start()
+    logins = [threading.Thread(target=login_loop) for _ in range(8)]
+    for t in logins:
+        t.start()
+    for t in logins:
+        t.join()
+    burst_stop.set()
+    probe.join()
+
+    ok, busy = statuses.count(302), statuses.count(503)
+    assert ok + busy == len(statuses) == 32
+    assert ok > 0
+    assert peak <= 2
+
+    def p95(values):
+        return statistics.quantiles(values, n=20)[-1] * 1000
+
+    # Hashes only ever hold two workers, so a cheap page stays fast during the
+    # burst (~10 ms p95 here, ~1 ms idle)
+    assert p95(results['busy']) < max(100, 10 * p95(idle))
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from app import db, profiling
+from app.models import User
+from app.profiling import Sampler, list_profiles, make_token, save_profile
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _owner():
+    return User.query.filter_by(username='owner@example.com').one()
+
+
+def test_sampler_collects_folded_stacks_of_one_thread(app):
+    sampler = Sampler(threading.get_ident(), interval=0.001)
+    sampler.start()
+    _busy(0.2)
+    sampler.stop()
+
+    assert sampler.duration >= 0.2
+    lines = sampler.folded().splitlines()
+    counts = [int(line.rsplit(' ', 1)[1]) for line in lines]
+    assert counts == sorted(counts, reverse=True)
+    # Root first, leaf last, one frame per ';'-separated name
+    busiest = lines[0].rsplit(' ', 1)[0].split(';')
+    assert busiest[-1].startswith('_busy@test_profiling.py:')
+    assert any(name.startswith('test_sampler_collects_folded_stacks_of_one_thread@') for name in busiest)
+
+
+def test_owner_token_profiles_one_request(owner_client):
+    token = make_token(_owner())
+    assert owner_client.get(f'/clients?_profile={token}').status_code == 200
+    assert owner_client.get('/clients').status_code == 200  # not profiled
+
+    [profile] = list_profiles(owner_client.application)
+    assert profile['endpoint'] == 'clients.clients_list'
+    assert profile['name'].endswith('.folded')
+
+    download = owner_client.get(f"/admin/profiles/{profile['name']}")
+    assert download.status_code == 200
+    for line in download.get_data(as_text=True).splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert ';' in stack and int(count) > 0
+
+
+def test_invalid_foreign_and_expired_tokens_are_ignored(app, owner_client):
+    other = User(username='other@example.com', role='owner')
+    other.set_password('secret')
+    db.session.add(other)
+    db.session.commit()
+
+    owner_client.get('/clients?_profile=not-a-token')
+    owner_client.get('/clients', headers={profiling.HEADER: make_token(other)})
+    app.config['PROFILE_TOKEN_MAX_AGE'] = -1
+    owner_client.get('/clients', headers={profiling.HEADER: make_token(_owner())})
+
+    assert list_profiles(app) == []
+
+
+def test_only_the_newest_profiles_are_kept(app):
+    app.config['PROFILE_KEEP'] = 3
+    sampler = Sampler(threading.get_ident(), interval=1)
+    sampler.stacks['main@app.py:1;view@routes.py:10'] = 4
+    sampler.duration = 0.012
+
+    names = [save_profile(app, f'endpoint.{i}', sampler) for i in range(5)]
+
+    profiles = list_profiles(app)
+    assert [p['name'] for p in profiles] == names[:1:-1]
+    assert [p['endpoint'] for p in profiles] == ['endpoint.4', 'endpoint.3', 'endpoint.2']
+    assert profiles[0]['samples'] == 4 and profiles[0]['duration_ms'] == 12
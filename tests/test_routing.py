@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models import Client
+
+
+@pytest.fixture
+def engines_used(app):
+    """Names of the engines ('primary' / 'replica') each statement ran on, in order."""
+    used = []
+    listeners = []
+    for key, name in ((None, 'primary'), ('replica', 'replica')):
+        def record(conn, cursor, statement, *args, name=name):
+            used.append(name)
+        event.listen(db.engines[key], 'before_cursor_execute', record)
+        listeners.append((db.engines[key], record))
+    yield used
+    for engine, record in listeners:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def _unpin(client):
+    """Forget the read-your-writes pin set by an earlier POST (e.g. the login)."""
+    with client.session_transaction() as session:
+        session.pop('_db_primary_until', None)
+
+
+def test_read_only_view_reads_from_replica(owner_client, engines_used):
+    _unpin(owner_client)
+    assert owner_client.get('/clients').status_code == 200
+    assert engines_used and set(engines_used) == {'replica'}
+
+
+def test_write_view_uses_primary(owner_client, engines_used):
+    _unpin(owner_client)
+    response = owner_client.post('/clients/add', data={'name': 'Alice', 'email': 'alice@example.com'})
+    assert response.status_code == 302
+    assert engines_used and set(engines_used) == {'primary'}
+    assert Client.query.filter_by(email='alice@example.com').count() == 1
+
+
+def test_reads_right_after_a_write_stay_on_primary(owner_client, engines_used):
+    _unpin(owner_client)
+    owner_client.post('/clients/add', data={'name': 'Alice', 'email': 'alice@example.com'})
+    engines_used.clear()
+
+    assert b'alice@example.com' in owner_client.get('/clients').data
+    assert set(engines_used) == {'primary'}
+
+    _unpin(owner_client)
+    engines_used.clear()
+    owner_client.get('/clients')
+    assert set(engines_used) == {'replica'}
@@ -0,0 +1,72 @@
+import csv
+import io
+from datetime import date
+
+from app import db
+from app.models import ArchivedInvoice, ArchivedPayment, Client, Invoice, Payment
+from app.statements import Statement
+
+LIVE = [('2026-01-10', 'invoice', 100.0), ('2026-01-10', 'payment', 60.0),
+        ('2026-01-20', 'payment', 50.0), ('2026-02-01', 'invoice', 100.0)]
+ARCHIVED = [('2025-06-01', 'invoice', 30.0), ('2025-06-05', 'payment', 0.0)]
+
+
+def _ledger():
+    client = Client(name='Alice', email='alice@example.com')
+    db.session.add(client)
+    db.session.flush()
+    # Inserted out of date order; the statement has to sort them
+    later = Invoice(invoice_no='INV-2', client_id=client.id, amount=50.0, due_date=date(2026, 2, 1),
+                    description='=HYPERLINK("http://evil.example")')
+    first = Invoice(invoice_no='INV-1', client_id=client.id, amount=100.0, due_date=date(2026, 1, 10))
+    db.session.add_all([later, first])
+    db.session.flush()
+    db.session.add_all([Payment(invoice_id=first.id, amount=10.0, date=date(2026, 1, 20), method='@SUM(1)'),
+                        Payment(invoice_id=first.id, amount=40.0, date=date(2026, 1, 10), method='Cash')])
+    old = ArchivedInvoice(id=900, invoice_no='OLD-1', client_id=client.id, amount=30.0,
+                          due_date=date(2025, 6, 1))
+    db.session.add(old)
+    db.session.flush()
+    db.session.add(ArchivedPayment(id=900, invoice_id=old.id, amount=30.0, date=date(2025, 6, 5)))
+    db.session.commit()
+    return client
+
+
+def _summary(statement):
+    return [(row['date'], row['kind'], row['balance']) for row in statement.rows()]
+
+
+def test_running_balance_in_date_order(app):
+    client = _ledger()
+    statement = Statement(client)
+    assert _summary(statement) == LIVE
+    assert statement.closing_balance == 100.0
+
+
+def test_include_archived_adds_history_before_live_rows(app):
+    client = _ledger()
+    statement = Statement(client, include_archived=True)
+    assert _summary(statement) == ARCHIVED + LIVE
+    assert statement.closing_balance == 100.0
+
+
+def test_range_starts_from_opening_balance(app):
+    client = _ledger()
+    statement = Statement(client, start=date(2026, 1, 15), end=date(2026, 1, 31))
+    assert statement.opening_balance == 60.0
+    assert _summary(statement) == [('2026-01-20', 'payment', 50.0)]
+    assert statement.closing_balance == 50.0
+
+
+def test_csv_export_neutralises_formulas(owner_client):
+    client = _ledger()
+    response = owner_client.get(f'/client/{client.id}/statement.csv?include_archived=1')
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+
+    assert rows[1][1] == 'Opening balance' and rows[-1][1] == 'Closing balance'
+    entries = rows[2:-1]
+    assert [row[0] for row in entries] == [d for d, _, _ in ARCHIVED + LIVE]
+    assert entries[-1][3] == '\'=HYPERLINK("http://evil.example")'
+    assert entries[-2][3] == "'@SUM(1)"
+    assert entries[-3][3] == 'Cash'
+    assert rows[-1][-1] == '100.00'